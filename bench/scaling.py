@@ -0,0 +1,204 @@
+"""
+    scaling.py
+
+    Measures how the main code paths scale with the size of the knowledge base, using synthetic knowledge
+    directories from wurm_food.synthetic. Each code path is measured for throughput and for the peak memory of one
+    call, alongside the load time and retained memory of the knowledge base itself. Run from the repository root:
+
+        python -m bench.scaling --scales 1 10 100 --plot scaling.png
+
+    Plotting requires matplotlib. Without it the results are only printed.
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from wurm_food.knowledge import KnowledgeBase
+from wurm_food.recipe.ingredient import RecipeIngredient
+from wurm_food.recipe.search import InventorySolver
+from wurm_food.recipe.selector.filter import UniformSampleFilter, WeightedSampleFilter
+from wurm_food.recipe.selector.selector import IngredientCategorySelector
+from wurm_food.synthetic import generate_knowledge
+
+THROUGHPUT_COLUMNS = [
+    'category_select',
+    'uniform_sample',
+    'weighted_sample',
+    'from_name_string',
+    'inventory_solve',
+]
+
+
+def measure_throughput(fn: Callable[[], None], min_time: float) -> float:
+    """
+    Call `fn` repeatedly for at least `min_time` seconds, returning calls per second.
+    """
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return calls / elapsed
+
+
+def measure_peak_memory(fn: Callable[[], None]) -> float:
+    """
+    Call `fn` once to warm any caches, then again under tracemalloc, returning the peak memory it allocated in MiB.
+    """
+    fn()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def measure_load(knowledge_dir: str) -> (KnowledgeBase, float, float):
+    """
+    Load a knowledge base, returning it with the load time in seconds and its retained memory in MiB.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    kb = KnowledgeBase.load_from_json(knowledge_dir)
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return kb, elapsed, retained / (1024 * 1024)
+
+
+def benchmark_scale(base: KnowledgeBase, scale: float, min_time: float, seed: int) -> Dict[str, float]:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as knowledge_dir:
+        counts = generate_knowledge(knowledge_dir, base, scale, seed=seed)
+        kb, load_time, memory = measure_load(knowledge_dir)
+
+    categories = list(kb.categories().keys())
+    ingredients = list(kb.ingredients().values())
+    rarities = list(kb.rarities().values())
+    preparations = list(kb.preparation_methods().values())
+
+    category_selectors = [IngredientCategorySelector(category) for category in categories]
+    uniform = UniformSampleFilter(IngredientCategorySelector(rng.choice(categories)), num_samples=1)
+    weighted = WeightedSampleFilter(IngredientCategorySelector(rng.choice(categories)), num_samples=1,
+                                    weights=lambda ingredient: 1.0 + ingredient.id() % 7)
+    names = [str(RecipeIngredient(rng.choice(ingredients), rng.choice(rarities), rng.choice(preparations))).lower()
+             for _ in range(100)]
+    inventory = {RecipeIngredient(ingredient, rng.choice(rarities), rng.choice(preparations)): rng.randrange(1, 5)
+                 for ingredient in rng.sample(ingredients, min(200, len(ingredients)))}
+    target = rng.choice(list(kb.skill_affinities().values()))
+
+    def category_select():
+        for selector in category_selectors:
+            selector.select(kb)
+
+    def from_name_string():
+        for name in names:
+            RecipeIngredient.from_name_string(name, kb)
+
+    def inventory_solve():
+        InventorySolver(kb, inventory, [kb.get_cooker('oven')], [kb.get_container('pottery bowl')],
+                        max_ingredients=6).solve(target, limit=1)
+
+    paths = {
+        'category_select': (category_select, len(category_selectors)),
+        'uniform_sample': (lambda: uniform.select(kb), 1),
+        'weighted_sample': (lambda: weighted.select(kb), 1),
+        'from_name_string': (from_name_string, len(names)),
+        'inventory_solve': (inventory_solve, 1),
+    }
+
+    result = {
+        'scale': scale,
+        'ingredients': counts['ingredients'],
+        'categories': counts['categories'],
+        'preparations': counts['preparations'],
+        'load_s': load_time,
+        'memory_mib': memory,
+    }
+    for column in THROUGHPUT_COLUMNS:
+        fn, operations = paths[column]
+        result[column] = measure_throughput(fn, min_time) * operations
+        result[peak_memory_column(column)] = measure_peak_memory(fn)
+    return result
+
+
+def peak_memory_column(column: str) -> str:
+    return column + '_peak_mib'
+
+
+def print_results(results: List[Dict[str, float]]):
+    columns = ['scale', 'ingredients', 'categories', 'preparations', 'load_s', 'memory_mib'] + THROUGHPUT_COLUMNS + \
+        [peak_memory_column(column) for column in THROUGHPUT_COLUMNS]
+    print('\t'.join(columns))
+    for result in results:
+        print('\t'.join('{:.4g}'.format(result[column]) for column in columns))
+
+
+def plot_results(results: List[Dict[str, float]], filename: str) -> bool:
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+
+    sizes = [result['ingredients'] for result in results]
+    fig, (throughput_ax, memory_ax, load_ax) = plt.subplots(1, 3, figsize=(18, 5))
+
+    for column in THROUGHPUT_COLUMNS:
+        throughput_ax.plot(sizes, [result[column] for result in results], marker='o', label=column)
+    throughput_ax.set_xscale('log')
+    throughput_ax.set_yscale('log')
+    throughput_ax.set_xlabel('ingredients')
+    throughput_ax.set_ylabel('operations / s')
+    throughput_ax.legend()
+
+    memory_ax.plot(sizes, [result['memory_mib'] for result in results], marker='o', label='knowledge base')
+    for column in THROUGHPUT_COLUMNS:
+        memory_ax.plot(sizes, [result[peak_memory_column(column)] for result in results], marker='o',
+                       label='{} peak'.format(column))
+    memory_ax.set_xscale('log')
+    memory_ax.set_yscale('log')
+    memory_ax.set_xlabel('ingredients')
+    memory_ax.set_ylabel('memory (MiB)')
+    memory_ax.legend()
+
+    load_ax.plot(sizes, [result['load_s'] for result in results], marker='o')
+    load_ax.set_xscale('log')
+    load_ax.set_yscale('log')
+    load_ax.set_xlabel('ingredients')
+    load_ax.set_ylabel('load time (s)')
+
+    fig.tight_layout()
+    fig.savefig(filename)
+    return True
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Benchmark the library against synthetic knowledge bases.')
+    parser.add_argument('-k', '--knowledge', default='data/knowledge', help='The base knowledge directory')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100], help='The data scales to run')
+    parser.add_argument('--min-time', type=float, default=0.25, help='Seconds to spend on each measurement')
+    parser.add_argument('--seed', type=int, default=0, help='The random seed')
+    parser.add_argument('--plot', help='Write a plot of the results to this file')
+    args = parser.parse_args(argv)
+
+    base = KnowledgeBase.load_from_json(args.knowledge)
+    results = [benchmark_scale(base, scale, args.min_time, args.seed) for scale in args.scales]
+    print_results(results)
+
+    if args.plot and not plot_results(results, args.plot):
+        print('matplotlib is not installed, so no plot was written', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import io
+import json
+import shutil
+import weakref
+
+from test.recipe.test_base import TestBase
+from wurm_food.knowledge import KnowledgeBase
+from wurm_food.recipe.builder.batch import BatchRunner, SpecCompiler
+from wurm_food.recipe.ingredient import RecipeIngredient
+
+
+class TestBatch(TestBase):
+    def test_spec_compiler_shares_selectors(self):
+        compiler = SpecCompiler(self._kb)
+        spec = {'name': 'ingredient', 'args': ['corn', 'chopped carrot']}
+
+        selector = compiler.compile(spec)
+
+        assert compiler.compile(dict(spec)) is selector
+        assert selector.select(self._kb) == [
+            RecipeIngredient.from_name_string('corn', self._kb),
+            RecipeIngredient.from_name_string('chopped carrot', self._kb),
+        ]
+
+    def test_spec_compiler_reload(self, tmp_path):
+        shutil.copytree('../data/knowledge', tmp_path, dirs_exist_ok=True)
+        kb = KnowledgeBase.load_from_json(str(tmp_path))
+        compiler = SpecCompiler(kb)
+        spec = {'name': 'ingredient', 'args': ['corn']}
+        selector = compiler.compile(spec)
+
+        with open(tmp_path / 'ingredient.json') as fp:
+            data = json.load(fp)
+        data['ingredients']['corn']['id'] += 1
+        with open(tmp_path / 'ingredient.json', 'w') as fp:
+            json.dump(data, fp)
+        kb.reload()
+
+        reloaded = compiler.compile(spec)
+        assert reloaded is not selector
+        assert reloaded.select(kb)[0].ingredient().id() == data['ingredients']['corn']['id']
+
+    def test_spec_compiler_unrelated_reload(self, tmp_path):
+        shutil.copytree('../data/knowledge', tmp_path, dirs_exist_ok=True)
+        kb = KnowledgeBase.load_from_json(str(tmp_path))
+        compiler = SpecCompiler(kb)
+        spec = {'name': 'ingredient', 'args': ['corn']}
+        selector = compiler.compile(spec)
+
+        with open(tmp_path / 'cooker.json') as fp:
+            data = json.load(fp)
+        data['cookers']['oven']['value'] += 1
+        with open(tmp_path / 'cooker.json', 'w') as fp:
+            json.dump(data, fp)
+
+        assert kb.reload().changed_collections() == ['cookers']
+        assert compiler.compile(spec) is selector
+
+    def test_spec_compiler_is_not_kept_alive(self):
+        kb = KnowledgeBase.load_from_json('../data/knowledge')
+        compiler = weakref.ref(SpecCompiler(kb))
+
+        assert compiler() is None
+
+    def test_run_file(self):
+        specs = [
+            {
+                'id': 'a',
+                'cooker': 'oven',
+                'container': 'pottery bowl',
+                'count': 3,
+                'selectors': [
+                    {'name': 'ingredient', 'args': ['corn']},
+                    {'name': 'combine', 'selectors': [
+                        {'name': 'ingredient', 'args': ['potato', 'carrot'],
+                         'filters': [{'name': 'uniform_sample', 'kwargs': {'num_samples': 1}}]},
+                    ]},
+                ],
+            },
+            {
+                'cooker': 'oven',
+                'container': 'pottery bowl',
+                'selectors': [
+                    {'name': 'ingredient', 'args': ['carrot'], 'filters': [{'name': 'prepare', 'args': ['chopped']}]},
+                ],
+            },
+            {'cooker': 'not a cooker', 'container': 'pottery bowl'},
+        ]
+        for max_workers in (1, 2):
+            self._check_run_file(specs, BatchRunner(self._kb, max_workers=max_workers, chunk_size=1))
+
+    def _check_run_file(self, specs, runner):
+        lines = [json.dumps(spec) for spec in specs] + ['{"cooker": "oven",', '[1, 2]', json.dumps(specs[1])]
+        in_fp = io.StringIO('\n'.join(lines))
+        out_fp = io.StringIO()
+
+        stats = runner.run_file(in_fp, out_fp)
+        results = [json.loads(line) for line in out_fp.getvalue().splitlines()]
+
+        assert [result['id'] for result in results] == ['a', 1, 2, 3, 4, 5]
+        assert len(results[0]['recipes']) == 3
+        for recipe in results[0]['recipes']:
+            assert recipe[0] == 'Corn'
+            assert recipe[1] in ('Potato', 'Carrot')
+        assert results[1]['recipes'] == [['Chopped Carrot']]
+        assert 'error' in results[2]
+        assert 'JSONDecodeError' in results[3]['error']
+        assert 'json object' in results[4]['error']
+        assert results[5]['recipes'] == [['Chopped Carrot']]
+        assert stats.count() == 6
+        assert stats.errors() == 3
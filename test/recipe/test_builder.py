@@ -13,4 +13,20 @@ class TestBuilder(TestBase):
 
         selector = builder.select('ingredient', 'corn').build()
 
-        assert selector.select(self._kb) == [RecipeIngredient.from_name_string('corn', self._kb)]
\ No newline at end of file
+        assert selector.select(self._kb) == [RecipeIngredient.from_name_string('corn', self._kb)]
+
+    def test_build_random_recipe(self):
+        builder = RecipeBuilder(
+            self._kb.get_cooker('oven'),
+            self._kb.get_container('pottery bowl'),
+            self._kb,
+        )
+
+        builder.select('ingredient', 'corn')
+        builder.select('ingredient', 'carrot').filter('prepare', self._kb.get_preparation_method('chopped'))
+        recipe = builder.build_random_recipe()
+
+        assert recipe.ingredients() == [
+            RecipeIngredient.from_name_string('corn', self._kb),
+            RecipeIngredient.from_name_string('chopped carrot', self._kb),
+        ]
@@ -1,8 +1,15 @@
+import json
+import shutil
+
+import pytest
+
 from test.recipe.test_base import TestBase
 from wurm_food.knowledge import KnowledgeBase
 from wurm_food.recipe.ingredient import RecipeIngredient
-from wurm_food.recipe.selector.filter import UniformSampleFilter, PrepareIngredientFilter
+from wurm_food.recipe.selector import FILTER_REGISTRY
+from wurm_food.recipe.selector.filter import UniformSampleFilter, PrepareIngredientFilter, WeightedSampleFilter
 from wurm_food.recipe.selector.selector import ExactIngredientSelector, IngredientCategorySelector
+from wurm_food.util import AliasTable
 
 
 class TestFilter(TestBase):
@@ -47,4 +54,75 @@ class TestFilter(TestBase):
 
         for selector, expected in zip(SELECTORS, EXPECTED):
             ingredients = selector.select(self._kb)
-            assert ingredients == expected
\ No newline at end of file
+            assert ingredients == expected
+
+    def test_weighted_sample_filter(self, tmp_path):
+        assert FILTER_REGISTRY.get('weighted_sample').cls is WeightedSampleFilter
+
+        potato = RecipeIngredient.from_name_string('potato', self._kb)
+        rare_potato = RecipeIngredient.from_name_string('rare potato', self._kb)
+        carrot = RecipeIngredient.from_name_string('carrot', self._kb)
+        selector = WeightedSampleFilter(
+            ExactIngredientSelector(potato, rare_potato, carrot),
+            num_samples=20,
+            allow_duplicates=True,
+            ingredient_weights={'carrot': 0.0},
+            rarity_weights={'rare': 3.0},
+        )
+
+        selected = selector.select(self._kb)
+        assert len(selected) == 20
+        assert carrot not in selected
+
+        selector = WeightedSampleFilter(
+            IngredientCategorySelector('fruit'),
+            num_samples=5,
+            weights=lambda ingredient: 1.0 + ingredient.id(),
+        )
+        fruit = self._kb.ingredients_in_category('fruit')
+
+        for _ in range(10):
+            selected = selector.select(self._kb)
+            assert len(selected) == 5
+            assert len(set(selected)) == 5
+            for ingredient in selected:
+                assert ingredient in fruit
+
+        selector = WeightedSampleFilter(
+            IngredientCategorySelector('fruit'),
+            num_samples=len(fruit) + 1,
+        )
+        with pytest.raises(ValueError):
+            selector.select(self._kb)
+
+        shutil.copytree('../data/knowledge', tmp_path, dirs_exist_ok=True)
+        kb = KnowledgeBase.load_from_json(str(tmp_path))
+        first, second = [key for key, ingredient in kb.ingredients().items() if 'fruit' in ingredient.categories()][:2]
+        chosen_id = kb.get_ingredient(first).id()
+        selector = WeightedSampleFilter(
+            IngredientCategorySelector('fruit'),
+            weights=lambda ingredient: 1.0 if ingredient.id() == chosen_id else 0.0,
+        )
+        assert [ingredient.name() for ingredient in selector.select(kb)] == [kb.get_ingredient(first).name()]
+
+        with open(tmp_path / 'ingredient.json') as fp:
+            data = json.load(fp)
+        data['ingredients'][first]['id'], data['ingredients'][second]['id'] = \
+            data['ingredients'][second]['id'], data['ingredients'][first]['id']
+        with open(tmp_path / 'ingredient.json', 'w') as fp:
+            json.dump(data, fp)
+        kb.reload()
+
+        assert [ingredient.name() for ingredient in selector.select(kb)] == [kb.get_ingredient(second).name()]
+
+    def test_alias_table(self):
+        table = AliasTable([0.0, 1.0, 3.0])
+        counts = [0, 0, 0]
+        for _ in range(4000):
+            counts[table.sample()] += 1
+
+        assert counts[0] == 0
+        assert 2.0 < counts[2] / counts[1] < 4.5
+
+        with pytest.raises(ValueError):
+            AliasTable([0.0])
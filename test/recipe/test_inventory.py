@@ -0,0 +1,78 @@
+from collections import Counter
+
+from test.recipe.test_base import TestBase
+from wurm_food.recipe.ingredient import RecipeIngredient
+from wurm_food.recipe.recipe import Recipe
+from wurm_food.recipe.search import InventorySolver
+
+
+class TestInventorySolver(TestBase):
+    def _inventory(self):
+        return {
+            RecipeIngredient.from_name_string('rare chopped carrot', self._kb): 3,
+            RecipeIngredient.from_name_string('potato', self._kb): 10,
+            RecipeIngredient.from_name_string('corn', self._kb): 1,
+        }
+
+    def test_recipe_value(self):
+        recipe = Recipe(
+            self._kb.get_cooker('oven'),
+            self._kb.get_container('pottery bowl'),
+            [RecipeIngredient.from_name_string('corn', self._kb)],
+        )
+        expected = (40 + 77 + self._kb.get_ingredient('corn').id()) % 138
+
+        assert recipe.value() == expected
+        assert recipe.skill_affinity(self._kb).value() == expected
+
+    def test_solve(self):
+        inventory = self._inventory()
+        solver = InventorySolver(
+            self._kb,
+            inventory,
+            [self._kb.get_cooker('oven')],
+            [self._kb.get_container('pottery bowl'), self._kb.get_container('frying pan')],
+            max_ingredients=6,
+        )
+
+        skills = solver.reachable_skills()
+        assert skills
+        for skill in skills:
+            recipes = solver.solve(skill, limit=5)
+            assert recipes
+            for recipe in recipes:
+                assert recipe.skill_affinity(self._kb) == skill
+                assert 1 <= len(recipe) <= 6
+                for ingredient, count in Counter(recipe.ingredients()).items():
+                    assert count <= inventory[ingredient]
+
+        unreachable = [skill for skill in self._kb.skill_affinities().values() if skill not in skills]
+        for skill in unreachable:
+            assert solver.solve(skill) == []
+
+    def test_solve_exhaustive(self):
+        inventory = self._inventory()
+        solver = InventorySolver(
+            self._kb,
+            inventory,
+            [self._kb.get_cooker('oven')],
+            [self._kb.get_container('pottery bowl')],
+            max_ingredients=4,
+        )
+        target = solver.reachable_skills()[0]
+
+        found = {tuple(sorted(str(ingredient) for ingredient in recipe)) for recipe in solver.iter_solutions(target)}
+        expected = set()
+        items = list(inventory.items())
+        for carrots in range(4):
+            for potatoes in range(5):
+                for corn in range(2):
+                    counts = (carrots, potatoes, corn)
+                    if not 1 <= sum(counts) <= 4:
+                        continue
+                    ingredients = [item for (item, _), n in zip(items, counts) for _ in range(n)]
+                    recipe = Recipe(self._kb.get_cooker('oven'), self._kb.get_container('pottery bowl'), ingredients)
+                    if recipe.skill_affinity(self._kb) == target:
+                        expected.add(tuple(sorted(str(ingredient) for ingredient in ingredients)))
+
+        assert found == expected
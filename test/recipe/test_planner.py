@@ -0,0 +1,96 @@
+import time
+
+from test.recipe.test_base import TestBase
+from wurm_food.knowledge import KnowledgeBase
+from wurm_food.recipe.search import MultiTargetPlanner
+from wurm_food.synthetic import generate_knowledge
+
+
+class TestMultiTargetPlanner(TestBase):
+    def test_plan(self):
+        targets = list(self._kb.skill_affinities().values())[::10]
+        planner = MultiTargetPlanner(
+            self._kb,
+            targets,
+            [self._kb.get_cooker('oven')],
+            [self._kb.get_container('pottery bowl')],
+            preparation_methods=[self._kb.get_preparation_method('whole')],
+            max_ingredients=3,
+            seed=1,
+        )
+
+        plans = list(planner.iter_plans(time_budget=0.5))
+        for earlier, later in zip(plans, plans[1:]):
+            assert later.cost() < earlier.cost()
+
+        plan = plans[-1]
+        assert len(plan) + len(plan.unreachable()) == len(targets)
+        for target, recipe in plan.recipes().items():
+            assert recipe.skill_affinity(self._kb) == target
+            assert 1 <= len(recipe) <= 3
+            assert {ingredient.ingredient() for ingredient in recipe} <= plan.ingredients()
+
+    def test_unreachable(self):
+        targets = list(self._kb.skill_affinities().values())
+        planner = MultiTargetPlanner(
+            self._kb,
+            targets,
+            [self._kb.get_cooker('oven')],
+            [self._kb.get_container('pottery bowl')],
+            ingredients=[self._kb.get_ingredient('corn')],
+            preparation_methods=[self._kb.get_preparation_method('whole')],
+            max_ingredients=1,
+        )
+
+        plan = planner.plan(time_budget=0.1)
+        assert len(plan) == 1
+        assert plan.cost() == 1
+        assert len(plan.unreachable()) == len(targets) - 1
+
+    def test_empty_candidates(self):
+        targets = list(self._kb.skill_affinities().values())
+        planner = MultiTargetPlanner(
+            self._kb,
+            targets,
+            [self._kb.get_cooker('oven')],
+            [self._kb.get_container('pottery bowl')],
+            ingredients=[],
+        )
+
+        plan = planner.plan(time_budget=0.1)
+        assert len(plan) == 0
+        assert plan.cost() == 0
+        assert len(plan.unreachable()) == len(targets)
+
+    def test_time_budget(self, tmp_path):
+        generate_knowledge(str(tmp_path), self._kb, 10.0, seed=1)
+        kb = KnowledgeBase.load_from_json(str(tmp_path))
+        targets = list(kb.skill_affinities().values())
+        planner = MultiTargetPlanner(kb, targets, kb.cookers().values(), kb.containers().values(), seed=1)
+
+        # With no budget at all, only the first plan is made, and it is still complete.
+        start = time.perf_counter()
+        plans = list(planner.iter_plans(time_budget=0.0))
+        assert time.perf_counter() - start < 5.0
+        assert len(plans) == 1
+        assert len(plans[0]) + len(plans[0].unreachable()) == len(targets)
+        for target, recipe in plans[0].recipes().items():
+            assert recipe.skill_affinity(kb) == target
+
+    def test_stops_without_improvement(self):
+        targets = list(self._kb.skill_affinities().values())[::10]
+        planner = MultiTargetPlanner(
+            self._kb,
+            targets,
+            [self._kb.get_cooker('oven')],
+            [self._kb.get_container('pottery bowl')],
+            preparation_methods=[self._kb.get_preparation_method('whole')],
+            max_ingredients=3,
+            seed=1,
+            max_stale_restarts=5,
+        )
+
+        # The search ends long before this budget does once restarts stop finding smaller plans.
+        start = time.perf_counter()
+        planner.plan(time_budget=60.0)
+        assert time.perf_counter() - start < 60.0
@@ -0,0 +1,107 @@
+import json
+import shutil
+
+from wurm_food.cache import QueryCache, normalize_query
+from wurm_food.knowledge import KnowledgeBase
+
+
+class TestQueryCache(object):
+    @classmethod
+    def setup_class(cls):
+        cls._kb = KnowledgeBase.load_from_json('../data/knowledge')
+
+    def test_normalize_query(self):
+        mind = self._kb.get_skill_affinity('Mind')
+        oven = self._kb.get_cooker('oven')
+
+        assert normalize_query({'skill': mind, 'cooker': oven}) == normalize_query({'cooker': oven, 'skill': mind})
+        assert normalize_query({1, 2, 3}) == normalize_query({3, 2, 1})
+        assert normalize_query(('best', mind)) != normalize_query(('best', oven))
+
+    def test_memory_lru(self):
+        cache = QueryCache(max_memory_entries=2)
+        calls = []
+
+        def compute(value):
+            calls.append(value)
+            return value * 2
+
+        assert cache.get_or_compute(self._kb, ('a', 1), lambda: compute(1)) == 2
+        assert cache.get_or_compute(self._kb, ('a', 1), lambda: compute(1)) == 2
+        cache.put(self._kb, ('a', 2), 4)
+        cache.put(self._kb, ('a', 3), 6)
+
+        assert cache.get(self._kb, ('a', 1)) is None
+        assert calls == [1]
+        assert cache.stats().memory_hits == 1
+        assert cache.stats().misses == 2
+        assert cache.stats().memory_evictions == 1
+
+    def test_disk_persistence(self, tmp_path):
+        path = str(tmp_path / 'cache.sqlite')
+        query = ('best', self._kb.get_skill_affinity('Mind'), self._kb.get_cooker('oven'))
+
+        with QueryCache(path) as cache:
+            cache.put(self._kb, query, ['result'])
+
+        with QueryCache(path) as cache:
+            assert cache.get(self._kb, query) == ['result']
+            assert cache.stats().disk_hits == 1
+            assert cache.get(self._kb, query) == ['result']
+            assert cache.stats().memory_hits == 1
+
+    def test_disk_size_limit(self, tmp_path):
+        with QueryCache(str(tmp_path / 'cache.sqlite'), max_memory_entries=1, max_disk_bytes=2048) as cache:
+            for idx in range(10):
+                cache.put(self._kb, idx, b'x' * 500)
+
+            assert cache.stats().disk_evictions > 0
+            assert cache.get(self._kb, 9) == b'x' * 500
+            assert cache.get(self._kb, 0) is None
+
+    def test_invalidation(self, tmp_path):
+        knowledge_dir = tmp_path / 'knowledge'
+        shutil.copytree('../data/knowledge', knowledge_dir)
+        kb = KnowledgeBase.load_from_json(str(knowledge_dir))
+        path = str(tmp_path / 'cache.sqlite')
+
+        with QueryCache(path) as cache:
+            cache.put(kb, 'query', 1)
+
+            with open(knowledge_dir / 'cooker.json') as fp:
+                data = json.load(fp)
+            data['cookers']['oven']['value'] += 1
+            with open(knowledge_dir / 'cooker.json', 'w') as fp:
+                json.dump(data, fp)
+            kb.reload()
+
+            assert cache.get(kb, 'query') is None
+            assert cache.stats().invalidations == 1
+
+        with QueryCache(path) as cache:
+            assert cache.get(KnowledgeBase.load_from_json(str(knowledge_dir)), 'query') is None
+
+    def test_lazy_knowledge_base(self, tmp_path, monkeypatch):
+        knowledge_dir = tmp_path / 'knowledge'
+        shutil.copytree('../data/knowledge', knowledge_dir)
+        kb = KnowledgeBase.load_from_json(str(knowledge_dir), lazy=True)
+
+        reads = []
+        read_source = KnowledgeBase._read_source
+        monkeypatch.setattr(KnowledgeBase, '_read_source',
+                            staticmethod(lambda filename: reads.append(filename) or read_source(filename)))
+
+        with QueryCache() as cache:
+            cache.put(kb, 'query', 1)
+
+            # Changing a file without reloading leaves the knowledge base, and so the cache, as it was.
+            with open(knowledge_dir / 'cooker.json') as fp:
+                data = json.load(fp)
+            data['cookers']['oven']['value'] += 1
+            with open(knowledge_dir / 'cooker.json', 'w') as fp:
+                json.dump(data, fp)
+
+            for _ in range(10):
+                assert cache.get(kb, 'query') == 1
+            assert reads == []
+            assert cache.stats().invalidations == 0
@@ -0,0 +1,177 @@
+import json
+import shutil
+import threading
+
+import pytest
+
+from wurm_food.knowledge import KnowledgeBase
+
+
+class TestKnowledgeBase(object):
+    def test_lazy_load(self):
+        kb = KnowledgeBase.load_from_json('../data/knowledge', lazy=True)
+
+        for name in KnowledgeBase.COLLECTIONS:
+            assert not kb.is_loaded(name)
+
+        assert kb.get_cooker('oven').name() == 'oven'
+        assert kb.is_loaded('cookers')
+        assert not kb.is_loaded('skill_affinities')
+
+    def test_lazy_preload(self):
+        kb = KnowledgeBase.load_from_json('../data/knowledge', lazy=True, preload=['ingredients', 'rarities'])
+
+        assert kb.is_loaded('ingredients')
+        assert kb.is_loaded('rarities')
+        assert not kb.is_loaded('containers')
+
+    def test_lazy_matches_eager(self):
+        eager = KnowledgeBase.load_from_json('../data/knowledge')
+        lazy = KnowledgeBase.load_from_json('../data/knowledge', lazy=True)
+
+        for name in KnowledgeBase.COLLECTIONS:
+            assert eager.is_loaded(name)
+            assert getattr(eager, name)().keys() == getattr(lazy, name)().keys()
+
+    def test_reload(self, tmp_path):
+        shutil.copytree('../data/knowledge', tmp_path, dirs_exist_ok=True)
+        kb = KnowledgeBase.load_from_json(str(tmp_path), lazy=True, preload=['ingredients', 'rarities'])
+        diffs = []
+        kb.add_listener(lambda kb, diff: diffs.append(diff))
+
+        original_hash = kb.content_hash()
+        fruit = list(kb.ingredients_in_category('fruit'))
+        meat = kb.ingredients_in_category('meat')
+
+        assert kb.reload().is_empty()
+        assert kb.version() == 0
+
+        with open(tmp_path / 'ingredient.json') as fp:
+            data = json.load(fp)
+        name, record = next((k, v) for k, v in data['ingredients'].items() if 'fruit' in v['category'])
+        record['comb_id'] += 1
+        del data['ingredients'][name]
+        data['ingredients']['plum'] = dict(record, name='plum')
+        data['ingredients'][name] = record
+        with open(tmp_path / 'ingredient.json', 'w') as fp:
+            json.dump(data, fp)
+
+        diff = kb.reload()
+
+        assert kb.version() == 1
+        assert kb.content_hash() != original_hash
+        assert diff.changed_collections() == ['ingredients']
+        assert diff.get('ingredients') == ({'plum'}, set(), {name})
+        assert diffs == [diff]
+        assert kb.get_ingredient(name).combine_id() == record['comb_id']
+        assert len(kb.ingredients_in_category('fruit')) == len(fruit) + 1
+        assert kb.ingredients_in_category('meat') is meat
+        assert not kb.is_loaded('skill_affinities')
+
+    def test_reload_failure_changes_nothing(self, tmp_path):
+        shutil.copytree('../data/knowledge', tmp_path, dirs_exist_ok=True)
+        kb = KnowledgeBase.load_from_json(str(tmp_path))
+        diffs = []
+        kb.add_listener(lambda kb, diff: diffs.append(diff))
+        original_hash = kb.content_hash()
+        corn_id = kb.get_ingredient('corn').id()
+
+        with open(tmp_path / 'ingredient.json') as fp:
+            data = json.load(fp)
+        data['ingredients']['corn']['id'] += 1
+        with open(tmp_path / 'ingredient.json', 'w') as fp:
+            json.dump(data, fp)
+        with open(tmp_path / 'preparation.json') as fp:
+            preparations = fp.read()
+        with open(tmp_path / 'preparation.json', 'w') as fp:
+            fp.write(preparations[:len(preparations) // 2])
+
+        with pytest.raises(ValueError):
+            kb.reload()
+
+        assert kb.get_ingredient('corn').id() == corn_id
+        assert kb.content_hash() == original_hash
+        assert kb.version() == 0
+        assert diffs == []
+
+        with open(tmp_path / 'preparation.json', 'w') as fp:
+            fp.write(preparations)
+        diff = kb.reload()
+
+        assert diff.changed_collections() == ['ingredients']
+        assert diff.get('ingredients').changed == {'corn'}
+        assert kb.get_ingredient('corn').id() == corn_id + 1
+        assert kb.version() == 1
+        assert diffs == [diff]
+
+    def test_lazy_content_hash(self, tmp_path):
+        shutil.copytree('../data/knowledge', tmp_path, dirs_exist_ok=True)
+        kb = KnowledgeBase.load_from_json(str(tmp_path), lazy=True)
+        original_hash = kb.content_hash()
+
+        assert original_hash == KnowledgeBase.load_from_json(str(tmp_path)).content_hash()
+
+        with open(tmp_path / 'cooker.json') as fp:
+            data = json.load(fp)
+        data['cookers']['oven']['value'] += 1
+        with open(tmp_path / 'cooker.json', 'w') as fp:
+            json.dump(data, fp)
+
+        assert kb.content_hash() == original_hash
+        assert kb.version() == 0
+
+        # Loading the changed file is a change in content, just as a reload would be.
+        kb.get_cooker('oven')
+        assert kb.version() == 1
+        assert kb.content_hash() != original_hash
+
+    def test_lazy_load_during_reload(self, tmp_path):
+        shutil.copytree('../data/knowledge', tmp_path, dirs_exist_ok=True)
+        kb = KnowledgeBase.load_from_json(str(tmp_path), lazy=True, preload=['ingredients'])
+
+        with open(tmp_path / 'cooker.json') as fp:
+            cookers = json.load(fp)
+        cookers['cookers']['oven']['value'] += 1
+        with open(tmp_path / 'cooker.json', 'w') as fp:
+            json.dump(cookers, fp)
+        with open(tmp_path / 'ingredient.json') as fp:
+            ingredients = json.load(fp)
+        ingredients['ingredients']['corn']['id'] += 1
+        with open(tmp_path / 'ingredient.json', 'w') as fp:
+            json.dump(ingredients, fp)
+
+        # Both the reload and the lazy load of the changed cookers are changes, and neither may be lost.
+        threads = [threading.Thread(target=kb.reload), threading.Thread(target=kb.cookers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert kb.version() == 2
+        assert kb.content_hash() == KnowledgeBase.load_from_json(str(tmp_path)).content_hash()
+
+    def test_category_index_reload_during_build(self, tmp_path):
+        shutil.copytree('../data/knowledge', tmp_path, dirs_exist_ok=True)
+        kb = KnowledgeBase.load_from_json(str(tmp_path))
+
+        with open(tmp_path / 'ingredient.json') as fp:
+            data = json.load(fp)
+        record = next(v for v in data['ingredients'].values() if 'fruit' in v['category'])
+        data['ingredients']['plum'] = dict(record, name='plum', comb_id=record['comb_id'] + 1)
+        with open(tmp_path / 'ingredient.json', 'w') as fp:
+            json.dump(data, fp)
+
+        # Reload while a reader is part way through building the index from the old ingredients.
+        ingredient = next(iter(kb.ingredients().values()))
+        categories = ingredient.categories
+
+        def reload_once():
+            del ingredient.categories
+            kb.reload()
+            return categories()
+        ingredient.categories = reload_once
+
+        kb.ingredients_in_category('fruit')
+
+        assert 'plum' in kb.ingredients()
+        assert kb.get_ingredient('plum') in kb.ingredients_in_category('fruit')
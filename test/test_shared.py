@@ -0,0 +1,72 @@
+from multiprocessing import Pool
+import os
+import subprocess
+import sys
+
+import pytest
+
+from wurm_food.knowledge import Ingredient, KnowledgeBase
+from wurm_food.recipe.ingredient import RecipeIngredient
+from wurm_food.shared import SharedIngredients, SharedKnowledgeBase, initialize_worker, worker_knowledge_base
+
+
+def _count_ingredients(_) -> int:
+    return len(worker_knowledge_base().ingredients())
+
+
+class TestSharedKnowledgeBase(object):
+    @classmethod
+    def setup_class(cls):
+        cls._kb = KnowledgeBase.load_from_json('../data/knowledge', lazy=True)
+
+    def test_attach(self):
+        with SharedKnowledgeBase(self._kb) as shared:
+            kb = SharedKnowledgeBase.attach(shared.name())
+
+            for name in KnowledgeBase.COLLECTIONS:
+                assert list(getattr(kb, name)().keys()) == list(getattr(self._kb, name)().keys())
+
+            assert isinstance(kb.ingredients(), SharedIngredients)
+            assert kb.ingredients() == self._kb.ingredients()
+            assert kb.content_hash() == self._kb.content_hash()
+            assert 'not an ingredient' not in kb.ingredients()
+
+            for name, ingredient in self._kb.ingredients().items():
+                shared_ingredient = kb.get_ingredient(name)
+                assert shared_ingredient.id() == ingredient.id()
+                assert shared_ingredient.group_id() == ingredient.group_id()
+                assert shared_ingredient.categories() == ingredient.categories()
+
+    def test_lookup_tables(self):
+        with SharedKnowledgeBase(self._kb) as shared:
+            kb = SharedKnowledgeBase.attach(shared.name())
+
+            for category in self._kb.categories():
+                assert kb.ingredients_in_category(category) == self._kb.ingredients_in_category(category)
+            assert list(kb.ingredient_values()) == [ingredient.value() % Ingredient.MAX_INGREDIENT_ID
+                                                    for ingredient in self._kb.ingredients().values()]
+            assert RecipeIngredient.from_name_string('rare chopped carrot', kb) == \
+                RecipeIngredient.from_name_string('rare chopped carrot', self._kb)
+
+    def test_worker_pool(self):
+        with SharedKnowledgeBase(self._kb) as shared:
+            with Pool(2, initializer=initialize_worker, initargs=(shared.name(),)) as pool:
+                counts = pool.map(_count_ingredients, range(4))
+
+        assert counts == [len(self._kb.ingredients())] * 4
+
+    def test_attach_from_other_process(self):
+        with SharedKnowledgeBase(self._kb) as shared:
+            code = 'from wurm_food.shared import SharedKnowledgeBase; ' \
+                   'print(len(SharedKnowledgeBase.attach({!r}).ingredients()))'.format(shared.name())
+            env = dict(os.environ, PYTHONPATH=os.path.abspath('..'))
+            output = subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True, text=True)
+            assert int(output.stdout) == len(self._kb.ingredients())
+
+            # The segment outlives the other process.
+            assert len(SharedKnowledgeBase.attach(shared.name()).ingredients()) == len(self._kb.ingredients())
+
+    @pytest.mark.filterwarnings('error::pytest.PytestUnraisableExceptionWarning')
+    def test_attach_missing(self):
+        with pytest.raises(FileNotFoundError):
+            SharedKnowledgeBase.attach('wurm_food_no_such_segment')
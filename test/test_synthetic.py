@@ -0,0 +1,24 @@
+from wurm_food.knowledge import KnowledgeBase
+from wurm_food.recipe.ingredient import RecipeIngredient
+from wurm_food.synthetic import generate_knowledge
+
+
+class TestSynthetic(object):
+    def test_generate_knowledge(self, tmp_path):
+        base = KnowledgeBase.load_from_json('../data/knowledge')
+
+        counts = generate_knowledge(str(tmp_path), base, ingredient_scale=10, category_scale=2, seed=1)
+        kb = KnowledgeBase.load_from_json(str(tmp_path))
+
+        assert len(kb.ingredients()) == counts['ingredients'] == len(base.ingredients()) * 10
+        assert len(kb.categories()) == counts['categories'] == len(base.categories()) * 2
+        assert len(kb.preparation_methods()) == len(base.preparation_methods()) * 10
+        assert kb.skill_affinities() == base.skill_affinities()
+
+        for ingredient in kb.ingredients().values():
+            for category in ingredient.categories():
+                assert category in kb.categories()
+
+        name = 'rare prepared000003 ingredient000042'
+        parsed = RecipeIngredient.from_name_string(name, kb)
+        assert str(parsed).lower() == name
@@ -0,0 +1,201 @@
+"""
+    cache.py
+
+    Memoizes the results of expensive queries, such as recipe searches, across runs. Entries are keyed by a
+    normalized form of the query together with `KnowledgeBase.content_hash`, so results computed from older
+    reference data are never returned and are discarded once the data changes.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from wurm_food.knowledge import KnowledgeBase, ModelBase
+from wurm_food.recipe.ingredient import RecipeIngredient
+
+
+class CacheStats(object):
+    def __init__(self):
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        self.invalidations = 0
+
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def hit_rate(self) -> float:
+        total = self.hits() + self.misses
+        return self.hits() / total if total else 0.0
+
+    def __str__(self) -> str:
+        return '{} hits ({} memory, {} disk), {} misses, {:.1%} hit rate'.format(
+            self.hits(), self.memory_hits, self.disk_hits, self.misses, self.hit_rate())
+
+
+class QueryCache(object):
+    """
+    A two level cache: an in-memory LRU in front of an optional sqlite store on disk. Values must be picklable.
+    A cache serves one knowledge base at a time; using it with different reference data discards every entry
+    computed from the old data.
+
+    ## Example
+
+    `cache.get_or_compute(kb, ('inventory', skill, cooker), lambda: solver.solve(skill))`
+    :param path: The sqlite file to persist entries to, or None to only cache in memory.
+    :param max_memory_entries: The most entries kept in memory.
+    :param max_disk_bytes: The most bytes of pickled values kept on disk. The least recently used are evicted first.
+    """
+    def __init__(self, path: Optional[str] = None, max_memory_entries: int = 256,
+                 max_disk_bytes: int = 64 * 1024 * 1024):
+        self._memory = OrderedDict()
+        self._max_memory_entries = max_memory_entries
+        self._max_disk_bytes = max_disk_bytes
+        self._stats = CacheStats()
+        self._lock = threading.RLock()
+        self._current_hash = None
+        self._db = None
+
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, kb_hash TEXT NOT NULL, value BLOB NOT NULL, '
+                'size INTEGER NOT NULL, accessed REAL NOT NULL)'
+            )
+            self._db.commit()
+
+    def __enter__(self) -> 'QueryCache':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> CacheStats:
+        return self._stats
+
+    def get(self, kb: KnowledgeBase, query: Any, default: Any = None) -> Any:
+        with self._lock:
+            key = self._key(kb, query)
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats.memory_hits += 1
+                return self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+                    self._db.commit()
+                    value = pickle.loads(row[0])
+                    self._remember(key, value)
+                    self._stats.disk_hits += 1
+                    return value
+
+            self._stats.misses += 1
+            return default
+
+    def put(self, kb: KnowledgeBase, query: Any, value: Any):
+        with self._lock:
+            key = self._key(kb, query)
+            self._remember(key, value)
+
+            if self._db is not None:
+                data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                if len(data) > self._max_disk_bytes:
+                    return
+                self._db.execute(
+                    'INSERT OR REPLACE INTO entries (key, kb_hash, value, size, accessed) VALUES (?, ?, ?, ?, ?)',
+                    (key, self._current_hash, data, len(data), time.time()),
+                )
+                self._evict_disk()
+                self._db.commit()
+
+    def get_or_compute(self, kb: KnowledgeBase, query: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for `query`, calling `compute` and caching its result on a miss.
+        """
+        missing = object()
+        value = self.get(kb, query, missing)
+        if value is missing:
+            value = compute()
+            self.put(kb, query, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM entries')
+                self._db.commit()
+
+    def _key(self, kb: KnowledgeBase, query: Any) -> str:
+        kb_hash = kb.content_hash()
+        if kb_hash != self._current_hash:
+            self._invalidate(kb_hash)
+        normalized = json.dumps(normalize_query(query), sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256((kb_hash + normalized).encode()).hexdigest()
+
+    def _invalidate(self, kb_hash: str):
+        # Entries are only ever looked up with the current hash, so all others can be dropped.
+        if self._db is not None:
+            removed = self._db.execute('DELETE FROM entries WHERE kb_hash != ?', (kb_hash,)).rowcount
+            self._db.commit()
+            self._stats.invalidations += max(removed, 0)
+        else:
+            self._stats.invalidations += len(self._memory)
+        self._memory.clear()
+        self._current_hash = kb_hash
+
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats.memory_evictions += 1
+
+    def _evict_disk(self):
+        total, = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()
+        while total > self._max_disk_bytes:
+            key, size = self._db.execute('SELECT key, size FROM entries ORDER BY accessed LIMIT 1').fetchone()
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+            self._stats.disk_evictions += 1
+
+
+def normalize_query(query: Any) -> Any:
+    """
+    Convert a query into a canonical json-serializable form. Knowledge base models and recipe ingredients are
+    replaced by their type and identity, dicts are keyed by string, and sets are sorted.
+    """
+    if query is None or isinstance(query, (bool, int, float, str)):
+        return query
+    if isinstance(query, RecipeIngredient):
+        return {'__type__': 'RecipeIngredient', 'name': str(query).lower()}
+    if isinstance(query, ModelBase):
+        return {'__type__': type(query).__name__, 'json': query.to_json()}
+    if isinstance(query, dict):
+        return {'__dict__': sorted([json.dumps(normalize_query(key), sort_keys=True), normalize_query(value)]
+                                   for key, value in query.items())}
+    if isinstance(query, (set, frozenset)):
+        return {'__set__': sorted(json.dumps(normalize_query(value), sort_keys=True) for value in query)}
+    if isinstance(query, (list, tuple)):
+        return [normalize_query(value) for value in query]
+    raise TypeError('Cannot use a {} in a cache query'.format(type(query).__name__))
@@ -6,9 +6,11 @@
 """
 
 from abc import abstractmethod, ABC
+import hashlib
 import json
 import os
-from typing import Dict, List, Type, TypeVar
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Type, TypeVar
 
 T = TypeVar('T')
 
@@ -96,7 +98,7 @@ class Category(ModelBase):
     def to_json(self) -> str:
         return json.dumps({
             'name': self._name,
-            'id': self._value,
+            'id': self._id,
         })
 
     @classmethod
@@ -138,6 +140,12 @@ class Ingredient(ModelBase):
     def combine_id(self) -> int:
         return self._combine_id
 
+    def value(self) -> int:
+        """
+        The ingredient's contribution to a recipe's affinity, which is its item template id.
+        """
+        return self._id
+
     def categories(self) -> List[str]:
         return self._categories
 
@@ -182,7 +190,60 @@ class SkillAffinity(NameValueModel):
         super().__init__(name, value)
 
 
+class CollectionDiff(NamedTuple):
+    """
+    The keys of a single collection which differ between two loads of a knowledge base.
+    """
+    added: Set[str]
+    removed: Set[str]
+    changed: Set[str]
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def keys(self) -> Set[str]:
+        return self.added | self.removed | self.changed
+
+
+class KnowledgeDiff(object):
+    """
+    The differences found by `KnowledgeBase.reload`, keyed by collection name.
+    """
+    def __init__(self, collections: Optional[Dict[str, CollectionDiff]] = None):
+        self._collections = collections or {}
+
+    def __bool__(self) -> bool:
+        return not self.is_empty()
+
+    def get(self, name: str) -> CollectionDiff:
+        return self._collections.get(name, CollectionDiff(set(), set(), set()))
+
+    def changed_collections(self) -> List[str]:
+        return [name for name, diff in self._collections.items() if not diff.is_empty()]
+
+    def is_empty(self) -> bool:
+        return not self.changed_collections()
+
+
 class KnowledgeBase(object):
+    """
+    The collection of all reference data. Each collection may be loaded eagerly, or lazily on first access when
+    created with `load_from_json(..., lazy=True)`.
+
+    A knowledge base loaded from json can be reloaded in place with `reload`. Each collection is replaced as a
+    whole, so readers are never blocked and never see a partially loaded collection. Caches derived from the
+    knowledge base can register with `add_listener` to be told what changed.
+    """
+    COLLECTIONS = (
+        'containers',
+        'cookers',
+        'categories',
+        'ingredients',
+        'preparation_methods',
+        'rarities',
+        'skill_affinities',
+    )
+
     def __init__(self):
         self._containers = {}
         self._cookers = {}
@@ -191,6 +252,17 @@ class KnowledgeBase(object):
         self._preparation_methods = {}
         self._rarities = {}
         self._skill_affinities = {}
+        self._sources = {}
+        self._source_hashes = {}
+        self._pending = set()
+        self._version = 0
+        self._content_hash = (None, None)
+        self._category_index = (None, {})
+        self._listeners = []
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        # Guards _version, _source_hashes and _content_hash, which must always change together.
+        self._version_lock = threading.Lock()
 
     @classmethod
     def load_from_json(cls,
@@ -201,66 +273,249 @@ class KnowledgeBase(object):
                        ingredient_file='ingredient.json',
                        preparation_file='preparation.json',
                        rarity_file='rarity.json',
-                       skill_affinity_file='skill.json'):
+                       skill_affinity_file='skill.json',
+                       lazy: bool = False,
+                       preload: Optional[Iterable[str]] = None) -> 'KnowledgeBase':
+        """
+        Load a knowledge base from a directory of json files.
+        :param lazy: If True, each collection is only parsed the first time it is accessed.
+        :param preload: Collection names, from `KnowledgeBase.COLLECTIONS`, to parse immediately when `lazy` is set.
+        """
         knowledge_base = KnowledgeBase()
 
-        cls._load_to_dict(knowledge_base._containers, Container, os.path.join(base_dir, container_file), 'containers')
-        cls._load_to_dict(knowledge_base._cookers, Cooker, os.path.join(base_dir, cooker_file), 'cookers')
-        cls._load_to_dict(knowledge_base._categories, Category, os.path.join(base_dir, category_file), 'categories')
-        cls._load_to_dict(knowledge_base._ingredients, Ingredient, os.path.join(base_dir, ingredient_file), 'ingredients')
-        cls._load_to_dict(knowledge_base._preparation_methods, PreparationMethod,
-                          os.path.join(base_dir, preparation_file), 'preparations')
-        cls._load_to_dict(knowledge_base._rarities, Rarity, os.path.join(base_dir, rarity_file), 'rarities')
-        cls._load_to_dict(knowledge_base._skill_affinities, SkillAffinity,
-                          os.path.join(base_dir, skill_affinity_file), 'skills')
+        knowledge_base._sources = {
+            'containers': (Container, os.path.join(base_dir, container_file), 'containers'),
+            'cookers': (Cooker, os.path.join(base_dir, cooker_file), 'cookers'),
+            'categories': (Category, os.path.join(base_dir, category_file), 'categories'),
+            'ingredients': (Ingredient, os.path.join(base_dir, ingredient_file), 'ingredients'),
+            'preparation_methods': (PreparationMethod, os.path.join(base_dir, preparation_file), 'preparations'),
+            'rarities': (Rarity, os.path.join(base_dir, rarity_file), 'rarities'),
+            'skill_affinities': (SkillAffinity, os.path.join(base_dir, skill_affinity_file), 'skills'),
+        }
+        knowledge_base._pending = set(cls.COLLECTIONS)
+
+        if lazy:
+            knowledge_base.preload(*(preload or []))
+            # Record what the unparsed files hold now, so content_hash never has to read them again.
+            for name in knowledge_base._pending:
+                knowledge_base._source_hashes[name] = cls._hash_source(
+                    cls._read_source(knowledge_base._sources[name][1]))
+        else:
+            knowledge_base.preload(*cls.COLLECTIONS)
 
         return knowledge_base
 
+    def __getstate__(self) -> Dict:
+        self.preload(*self.COLLECTIONS)
+        state = dict(self.__dict__)
+        del state['_load_lock']
+        del state['_reload_lock']
+        del state['_version_lock']
+        state['_listeners'] = []
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._version_lock = threading.Lock()
+
+    def preload(self, *collections: str):
+        """
+        Parse the named collections now, if they have not been already.
+        :param collections: Collection names from `KnowledgeBase.COLLECTIONS`.
+        """
+        for name in collections:
+            if name not in self.COLLECTIONS:
+                raise KeyError('{} is not a valid collection'.format(name))
+            self._collection(name)
+
+    def is_loaded(self, name: str) -> bool:
+        if name not in self.COLLECTIONS:
+            raise KeyError('{} is not a valid collection'.format(name))
+        return name not in self._pending
+
+    def version(self) -> int:
+        """
+        A counter which is incremented each time `reload` finds a change, or a lazily loaded file is found to have
+        changed since the knowledge base was created.
+        """
+        return self._version
+
+    def content_hash(self) -> str:
+        """
+        A digest of the source files of every collection, as they were when loaded or last reloaded. It only changes
+        along with `version`, and is computed once per version.
+        """
+        with self._version_lock:
+            version, content_hash = self._content_hash
+            if version != self._version or content_hash is None:
+                digest = hashlib.sha256()
+                for name in self.COLLECTIONS:
+                    if name in self._source_hashes:
+                        digest.update(self._source_hashes[name].encode())
+                content_hash = digest.hexdigest()
+                self._content_hash = (self._version, content_hash)
+            return content_hash
+
+    def add_listener(self, listener: Callable[['KnowledgeBase', KnowledgeDiff], None]):
+        """
+        Register a callable to be invoked with the knowledge base and a KnowledgeDiff after every reload which
+        changes the data.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[['KnowledgeBase', KnowledgeDiff], None]):
+        self._listeners.remove(listener)
+
+    def reload(self) -> KnowledgeDiff:
+        """
+        Re-read every loaded collection from its source file. Files which have not changed are not parsed again,
+        and collections which were never accessed stay unloaded.
+        :return: The keys added, removed or changed in each collection.
+        """
+        with self._reload_lock:
+            # Read and parse every changed source before touching anything, so a bad file changes nothing.
+            parsed = {}
+            for name in self.COLLECTIONS:
+                if name not in self._sources or name in self._pending:
+                    continue
+                builder_type, filename, collection_key = self._sources[name]
+                data = self._read_source(filename)
+                source_hash = self._hash_source(data)
+                if source_hash == self._source_hashes.get(name):
+                    continue
+                parsed[name] = (self._parse_collection(data, builder_type, collection_key), source_hash)
+
+            diffs = {}
+            with self._version_lock:
+                for name, (new, source_hash) in parsed.items():
+                    old = getattr(self, '_' + name)
+                    diffs[name] = CollectionDiff(
+                        added=set(new.keys() - old.keys()),
+                        removed=set(old.keys() - new.keys()),
+                        changed={key for key in new.keys() & old.keys() if new[key].to_json() != old[key].to_json()},
+                    )
+                    setattr(self, '_' + name, new)
+                    self._source_hashes[name] = source_hash
+
+                    if name == 'ingredients':
+                        self._invalidate_categories(diffs[name], old, new)
+
+                diff = KnowledgeDiff(diffs)
+                if diff:
+                    self._version += 1
+
+            if diff:
+                for listener in list(self._listeners):
+                    listener(self, diff)
+
+            return diff
+
     def containers(self) -> Dict[str, Container]:
-        return self._containers
+        return self._collection('containers')
 
     def cookers(self) -> Dict[str, Cooker]:
-        return self._cookers
+        return self._collection('cookers')
 
     def categories(self) -> Dict[str, Category]:
-        return self._categories
+        return self._collection('categories')
 
     def ingredients(self) -> Dict[str, Ingredient]:
-        return self._ingredients
+        return self._collection('ingredients')
 
     def preparation_methods(self) -> Dict[str, PreparationMethod]:
-        return self._preparation_methods
+        return self._collection('preparation_methods')
 
     def rarities(self) -> Dict[str, Rarity]:
-        return self._rarities
+        return self._collection('rarities')
 
     def skill_affinities(self) -> Dict[str, SkillAffinity]:
-        return self._skill_affinities
+        return self._collection('skill_affinities')
+
+    def ingredients_in_category(self, category: str) -> List[Ingredient]:
+        """
+        All ingredients in `category`, in the same order as `ingredients()`. The result is indexed and must not
+        be modified.
+        """
+        # The index is tagged with the ingredients it was built from, and replaced as a whole. An index built from
+        # ingredients which a concurrent reload has since replaced is never used.
+        ingredients = self.ingredients()
+        indexed_ingredients, index = self._category_index
+        if indexed_ingredients is not ingredients:
+            index = {}
+
+        selected = index.get(category)
+        if selected is None:
+            # Index every category which is missing in one pass, rather than scanning all ingredients per category.
+            built = {}
+            for ingredient in ingredients.values():
+                for name in ingredient.categories():
+                    built.setdefault(name, []).append(ingredient)
+            index = {**built, **index}
+            selected = index.setdefault(category, [])
+            self._category_index = (ingredients, index)
+        return selected
 
     def get_container(self, name: str) -> Container:
-        return self._containers[name]
+        return self.containers()[name]
 
     def get_cooker(self, name: str) -> Cooker:
-        return self._cookers[name]
+        return self.cookers()[name]
 
     def get_category(self, name: str) -> Category:
-        return self._categories[name]
+        return self.categories()[name]
 
     def get_ingredient(self, name: str) -> Ingredient:
-        return self._ingredients[name]
+        return self.ingredients()[name]
 
     def get_preparation_method(self, name: str) -> PreparationMethod:
-        return self._preparation_methods[name]
+        return self.preparation_methods()[name]
 
     def get_rarity(self, name: str) -> Rarity:
-        return self._rarities[name]
+        return self.rarities()[name]
 
     def get_skill_affinity(self, name: str) -> SkillAffinity:
-        return self._skill_affinities[name]
+        return self.skill_affinities()[name]
+
+    def _collection(self, name: str) -> Dict:
+        if name in self._pending:
+            with self._load_lock:
+                if name in self._pending:
+                    builder_type, filename, collection_key = self._sources[name]
+                    data = self._read_source(filename)
+                    setattr(self, '_' + name, self._parse_collection(data, builder_type, collection_key))
+                    source_hash = self._hash_source(data)
+                    with self._version_lock:
+                        if self._source_hashes.get(name, source_hash) != source_hash:
+                            # The file changed since it was recorded, so anything keyed by the old content is stale.
+                            self._version += 1
+                        self._source_hashes[name] = source_hash
+                    self._pending.discard(name)
+        return getattr(self, '_' + name)
+
+    def _invalidate_categories(self, diff: CollectionDiff, old: Dict[str, Ingredient], new: Dict[str, Ingredient]):
+        affected = set()
+        for key in diff.keys():
+            for ingredients in (old, new):
+                if key in ingredients:
+                    affected.update(ingredients[key].categories())
+        indexed_ingredients, index = self._category_index
+        if indexed_ingredients is not old:
+            return
+        index = {name: ingredients for name, ingredients in index.items() if name not in affected}
+        self._category_index = (new, index)
+
+    @staticmethod
+    def _read_source(filename: str) -> bytes:
+        with open(filename, 'rb') as fp:
+            return fp.read()
+
+    @staticmethod
+    def _hash_source(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
 
     @classmethod
-    def _load_to_dict(cls, dict: Dict, builder_type: Type, container_filename: str, collection_key: str) -> Dict[str, T]:
-        with open(container_filename, 'r') as fp:
-            obj = json.load(fp)
-            for k, v in obj[collection_key].items():
-                dict[k] = builder_type.from_json(v)
+    def _parse_collection(cls, data: bytes, builder_type: Type, collection_key: str) -> Dict[str, T]:
+        obj = json.loads(data)
+        return {k: builder_type.from_json(v) for k, v in obj[collection_key].items()}
@@ -0,0 +1,314 @@
+"""
+    batch.py
+
+    Runs many declarative recipe builder specifications, read from a json-lines file, against one knowledge base.
+
+    Each line is an object of the form
+
+        {
+            "id": "optional identifier, defaulting to the line number",
+            "cooker": "oven",
+            "container": "pottery bowl",
+            "count": 1,
+            "selectors": [
+                {"name": "category", "args": ["fruit"], "filters": [{"name": "uniform_sample", "kwargs": {"num_samples": 2}}]},
+                {"name": "combine", "selectors": [{"name": "ingredient", "args": ["corn"]}]}
+            ]
+        }
+
+    Argument parsing and the selectors built from each selector spec are cached and shared between all specs run
+    by the same process, so repeated ingredient names are only parsed once. With more than one worker, specs run
+    in a process pool attached to the knowledge base through wurm_food.shared, each worker with its own cache.
+"""
+
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import sys
+import time
+import weakref
+from typing import Any, Dict, IO, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from wurm_food.knowledge import KnowledgeBase, KnowledgeDiff
+from wurm_food.recipe.builder.builder import RecipeBuilder
+from wurm_food.recipe.recipe import Recipe
+from wurm_food.recipe.selector import SELECTOR_REGISTRY, FILTER_REGISTRY
+from wurm_food.recipe.selector.registry import SelectorRegistry
+from wurm_food.recipe.selector.selector import CombineSelector, Selector
+from wurm_food.shared import SharedKnowledgeBase, initialize_worker, worker_knowledge_base
+
+_worker_runner: Optional['BatchRunner'] = None
+
+# The collections which parsed selector and filter arguments are looked up in.
+_ARGUMENT_COLLECTIONS = ('ingredients', 'preparation_methods', 'rarities')
+
+
+class BatchResult(NamedTuple):
+    id: Any
+    recipes: List[Recipe]
+    elapsed: float
+    error: Optional[str] = None
+
+    def to_json(self) -> str:
+        obj = {'id': self.id, 'elapsed': self.elapsed}
+        if self.error is not None:
+            obj['error'] = self.error
+        else:
+            obj['recipes'] = [[str(ingredient) for ingredient in recipe] for recipe in self.recipes]
+        return json.dumps(obj)
+
+
+class BatchStats(object):
+    def __init__(self):
+        self._count = 0
+        self._errors = 0
+        self._spec_time = 0.0
+        self._start = time.perf_counter()
+        self._end = None
+
+    def record(self, result: BatchResult):
+        self._count += 1
+        self._spec_time += result.elapsed
+        if result.error is not None:
+            self._errors += 1
+
+    def finish(self):
+        self._end = time.perf_counter()
+
+    def count(self) -> int:
+        return self._count
+
+    def errors(self) -> int:
+        return self._errors
+
+    def wall_time(self) -> float:
+        end = self._end if self._end is not None else time.perf_counter()
+        return end - self._start
+
+    def throughput(self) -> float:
+        """
+        Specs completed per second of wall time.
+        """
+        wall_time = self.wall_time()
+        return self._count / wall_time if wall_time > 0 else 0.0
+
+    def mean_spec_time(self) -> float:
+        return self._spec_time / self._count if self._count else 0.0
+
+    def __str__(self) -> str:
+        return '{} specs ({} failed) in {:.3f}s: {:.1f} specs/s, {:.3f}ms mean per spec'.format(
+            self._count, self._errors, self.wall_time(), self.throughput(), self.mean_spec_time() * 1000.0)
+
+
+class SpecCompiler(object):
+    """
+    Builds selectors from selector specs, caching both parsed arguments and whole selector subtrees. The cached
+    selectors are shared, so the same spec always gives back the same selector object. Both caches are dropped
+    when a reload changes the ingredients, preparation methods or rarities which arguments are parsed into.
+    """
+    def __init__(self, kb: KnowledgeBase):
+        self._kb = kb
+        self._parsed_args = {}
+        self._selectors = {}
+        kb.add_listener(_WeakListener(self._on_reload))
+
+    def compile(self, spec: Dict) -> Selector:
+        key = _freeze(spec)
+        selector = self._selectors.get(key)
+        if selector is None:
+            selector = self._compile(spec)
+            self._selectors[key] = selector
+        return selector
+
+    def parse_args(self, registry: SelectorRegistry, name: str, args: List, kwargs: Dict) -> Tuple[List, Dict]:
+        key = (id(registry), name, _freeze(args), _freeze(kwargs))
+        parsed = self._parsed_args.get(key)
+        if parsed is None:
+            parsed = registry.get(name).args.parse_args(self._kb, *args, **kwargs)
+            self._parsed_args[key] = parsed
+        return parsed
+
+    def _compile(self, spec: Dict) -> Selector:
+        name = spec['name']
+        if name == 'combine':
+            selector = CombineSelector([self.compile(child) for child in spec.get('selectors', [])])
+        else:
+            args, kwargs = self.parse_args(SELECTOR_REGISTRY, name, spec.get('args', []), spec.get('kwargs', {}))
+            selector = SELECTOR_REGISTRY.get(name).cls(*args, **kwargs)
+
+        for filter_spec in spec.get('filters', []):
+            filter_name = filter_spec['name']
+            args, kwargs = self.parse_args(FILTER_REGISTRY, filter_name, filter_spec.get('args', []),
+                                           filter_spec.get('kwargs', {}))
+            selector = FILTER_REGISTRY.get(filter_name).cls(selector, *args, **kwargs)
+
+        return selector
+
+    def _on_reload(self, kb: KnowledgeBase, diff: KnowledgeDiff):
+        if any(not diff.get(name).is_empty() for name in _ARGUMENT_COLLECTIONS):
+            self._parsed_args = {}
+            self._selectors = {}
+
+
+class _WeakListener(object):
+    """
+    A knowledge base listener which only weakly refers to a bound method, and unregisters itself once the method's
+    object is gone, so registering does not keep the object alive.
+    """
+    def __init__(self, method):
+        self._method = weakref.WeakMethod(method)
+
+    def __call__(self, kb: KnowledgeBase, diff: KnowledgeDiff):
+        method = self._method()
+        if method is None:
+            kb.remove_listener(self)
+        else:
+            method(kb, diff)
+
+
+class BatchRunner(object):
+    """
+    Runs builder specs, yielding results in input order. With one worker specs run in this process. With more,
+    they are sent in chunks to a process pool which shares the knowledge base through a SharedKnowledgeBase, so
+    each run sees the knowledge base as it was when the run started.
+    :param max_workers: The number of worker processes.
+    :param chunk_size: The number of specs sent to a worker at a time.
+    :param max_pending: The number of chunks read ahead of the oldest unfinished one. Defaults to 4 per worker.
+    """
+    def __init__(self, kb: KnowledgeBase, max_workers: int = 1, chunk_size: int = 64,
+                 max_pending: Optional[int] = None):
+        self._kb = kb
+        self._compiler = SpecCompiler(kb)
+        self._max_workers = max_workers
+        self._chunk_size = chunk_size
+        self._max_pending = max_pending or max_workers * 4
+        self._stats = BatchStats()
+
+    def stats(self) -> BatchStats:
+        return self._stats
+
+    def run_spec(self, spec: Union[Dict, str], default_id: Any = None) -> BatchResult:
+        """
+        Run one spec, given either as a dict or as a line of json. Any error, including a line which does not
+        parse, gives a result with `error` set rather than raising.
+        """
+        spec_id = default_id
+        start = time.perf_counter()
+        try:
+            if isinstance(spec, str):
+                spec = json.loads(spec)
+            if not isinstance(spec, dict):
+                raise TypeError('A spec must be a json object, not {}'.format(type(spec).__name__))
+            spec_id = spec.get('id', default_id)
+            builder = RecipeBuilder(
+                self._kb.get_cooker(spec['cooker']),
+                self._kb.get_container(spec['container']),
+                self._kb,
+            )
+            for selector_spec in spec.get('selectors', []):
+                builder.add_selector(self._compiler.compile(selector_spec))
+            recipes = [builder.build_random_recipe() for _ in range(spec.get('count', 1))]
+            result = BatchResult(spec_id, recipes, time.perf_counter() - start)
+        except Exception as e:
+            result = BatchResult(spec_id, [], time.perf_counter() - start, '{}: {}'.format(type(e).__name__, e))
+
+        return result
+
+    def run(self, specs: Iterable[Union[Dict, str]]) -> Iterator[BatchResult]:
+        self._stats = BatchStats()
+        if self._max_workers <= 1:
+            for idx, spec in enumerate(specs):
+                result = self.run_spec(spec, idx)
+                self._stats.record(result)
+                yield result
+        else:
+            for result in self._run_pool(specs):
+                self._stats.record(result)
+                yield result
+        self._stats.finish()
+
+    def _run_pool(self, specs: Iterable[Union[Dict, str]]) -> Iterator[BatchResult]:
+        numbered = enumerate(specs)
+        with SharedKnowledgeBase(self._kb) as shared:
+            with ProcessPoolExecutor(max_workers=self._max_workers, initializer=_initialize_batch_worker,
+                                     initargs=(shared.name(),)) as executor:
+                pending = deque()
+                while True:
+                    chunk = list(itertools.islice(numbered, self._chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_run_chunk, chunk))
+                    if len(pending) >= self._max_pending:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+
+    def run_file(self, in_fp: IO[str], out_fp: IO[str]) -> BatchStats:
+        """
+        Run every spec in a json-lines stream, writing one json result per line to `out_fp`. Lines are parsed as
+        they are run, so a line which is not a valid spec only fails that spec.
+        """
+        for result in self.run(_spec_lines(in_fp)):
+            out_fp.write(result.to_json())
+            out_fp.write('\n')
+        return self._stats
+
+
+def read_specs(fp: IO[str]) -> Iterator[Dict]:
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _spec_lines(fp: IO[str]) -> Iterator[str]:
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def _initialize_batch_worker(name: str):
+    global _worker_runner
+    initialize_worker(name)
+    _worker_runner = BatchRunner(worker_knowledge_base())
+
+
+def _run_chunk(chunk: List[Tuple[int, Union[Dict, str]]]) -> List[BatchResult]:
+    return [_worker_runner.run_spec(spec, idx) for idx, spec in chunk]
+
+
+def _freeze(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return tuple(sorted((key, _freeze(value)) for key, value in obj.items()))
+    if isinstance(obj, (list, tuple)):
+        return tuple(_freeze(value) for value in obj)
+    return obj
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Build recipes from a json-lines file of builder specs.')
+    parser.add_argument('specs', help='The json-lines spec file, or - for stdin')
+    parser.add_argument('-o', '--output', help='The file to write results to. Defaults to stdout')
+    parser.add_argument('-k', '--knowledge', default='data/knowledge', help='The knowledge base directory')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='The number of worker processes')
+    args = parser.parse_args(argv)
+
+    runner = BatchRunner(KnowledgeBase.load_from_json(args.knowledge), max_workers=args.workers)
+    in_fp = sys.stdin if args.specs == '-' else open(args.specs, 'r')
+    out_fp = sys.stdout if args.output is None else open(args.output, 'w')
+    try:
+        stats = runner.run_file(in_fp, out_fp)
+    finally:
+        if in_fp is not sys.stdin:
+            in_fp.close()
+        if out_fp is not sys.stdout:
+            out_fp.close()
+
+    print(stats, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
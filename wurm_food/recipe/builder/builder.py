@@ -14,8 +14,8 @@ class SelectorBuilder(object):
         return self._selector
 
     def filter(self, name: str, *args, **kwargs) -> 'SelectorBuilder':
-        filter_cls = FILTER_REGISTRY.get(name)
-        filter = filter_cls(child=self._selector, *args, **kwargs)
+        entry = FILTER_REGISTRY.get(name)
+        filter = entry.cls(self._selector, *args, **kwargs)
         self._selector = filter
         return self
 
@@ -30,7 +30,7 @@ class RecipeBuilder(object):
     def build_random_recipe(self) -> Recipe:
         ingredients = []
         for selector in self._selectors:
-            selected = selector.select(self._kb)
+            selected = selector.build().select(self._kb)
             ingredients.extend(selected)
 
         return Recipe(
@@ -44,6 +44,12 @@ class RecipeBuilder(object):
         if entry.args:
             args, kwargs = entry.args.parse_args(self._kb, *args, **kwargs)
         selector = entry.cls(*args, **kwargs)
+        return self.add_selector(selector)
+
+    def add_selector(self, selector: Selector) -> SelectorBuilder:
+        """
+        Add an already constructed selector, such as one shared between several builders.
+        """
         builder = SelectorBuilder(selector)
         self._selectors.append(builder)
 
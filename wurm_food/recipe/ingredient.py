@@ -74,7 +74,7 @@ class RecipeIngredient(object):
         return self._rarity
 
     def preparation_method(self) -> PreparationMethod:
-        return self._preparation_methodf
+        return self._preparation_method
 
     def clone(self) -> 'RecipeIngredient':
         return copy.copy(self)
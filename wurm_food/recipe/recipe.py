@@ -1,7 +1,8 @@
-from typing import List
+from typing import List, Optional
 
-from wurm_food.knowledge import Cooker, Container
+from wurm_food.knowledge import Cooker, Container, KnowledgeBase, SkillAffinity
 from wurm_food.recipe.ingredient import RecipeIngredient
+from wurm_food.util import AffinityValue
 
 
 class Recipe(object):
@@ -22,6 +23,23 @@ class Recipe(object):
     def add_ingredient(self, ingredient: RecipeIngredient):
         self._ingredients.append(ingredient)
 
+    def value(self) -> int:
+        """
+        The affinity value of the recipe: the sum of the cooker, container and ingredient values, modulo the
+        number of skills.
+        """
+        total = self._cooker.value() + self._container.value()
+        for ingredient in self._ingredients:
+            total += ingredient.value()
+        return AffinityValue(total).value()
+
+    def skill_affinity(self, kb: KnowledgeBase) -> Optional[SkillAffinity]:
+        value = self.value()
+        for skill in kb.skill_affinities().values():
+            if skill.value() == value:
+                return skill
+        return None
+
     def __len__(self):
         return len(self._ingredients)
 
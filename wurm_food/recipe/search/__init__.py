@@ -0,0 +1,2 @@
+from .inventory import InventorySolver
+from .planner import MultiTargetPlanner, MultiTargetPlan
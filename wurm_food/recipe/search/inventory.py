@@ -0,0 +1,170 @@
+"""
+    inventory.py
+
+    Finds recipes which can be cooked from a fixed inventory and result in a chosen skill affinity.
+"""
+
+from typing import Iterable, Iterator, List, Mapping, Tuple
+
+from wurm_food.knowledge import Container, Cooker, Ingredient, KnowledgeBase, SkillAffinity
+from wurm_food.recipe.ingredient import RecipeIngredient
+from wurm_food.recipe.recipe import Recipe
+
+
+class InventorySolver(object):
+    """
+    Searches the recipes which can be made from an inventory for ones with a target affinity.
+
+    A recipe's affinity only depends on the sum of its values modulo `Ingredient.MAX_INGREDIENT_ID`, so the solver
+    runs a dynamic program over (ingredient count, residue) states, using each item at most as many times as it is
+    held. The reachable residues for each count are kept as bitmasks, one per item prefix, and recipes are then
+    read back out of the table without any backtracking dead ends. The table does not depend on the target, and is
+    built once per solver.
+    :param inventory: The number held of each ingredient.
+    :param cookers: The cookers available to cook with.
+    :param containers: The containers available to cook in.
+    :param min_ingredients: The fewest ingredients a recipe may use.
+    :param max_ingredients: The most ingredients a recipe may use.
+    """
+    def __init__(self, kb: KnowledgeBase, inventory: Mapping[RecipeIngredient, int], cookers: Iterable[Cooker],
+                 containers: Iterable[Container], min_ingredients: int = 1, max_ingredients: int = 10):
+        if min_ingredients < 0 or max_ingredients < min_ingredients:
+            raise ValueError('Invalid ingredient bounds {}..{}'.format(min_ingredients, max_ingredients))
+
+        self._kb = kb
+        self._modulo = Ingredient.MAX_INGREDIENT_ID
+        self._items: List[Tuple[RecipeIngredient, int, int]] = [
+            (ingredient, ingredient.value(), min(count, max_ingredients))
+            for ingredient, count in inventory.items() if count > 0
+        ]
+        self._cookers = list(cookers)
+        self._containers = list(containers)
+        self._min_ingredients = min_ingredients
+        self._max_ingredients = max_ingredients
+        self._layers = self._build_layers()
+
+    def solve(self, target: SkillAffinity, limit: int = 10) -> List[Recipe]:
+        """
+        Find up to `limit` recipes with the target affinity, preferring those with fewer ingredients.
+        """
+        recipes = []
+        for recipe in self.iter_solutions(target):
+            if len(recipes) >= limit:
+                break
+            recipes.append(recipe)
+        return recipes
+
+    def iter_solutions(self, target: SkillAffinity) -> Iterator[Recipe]:
+        for count in range(self._min_ingredients, self._max_ingredients + 1):
+            for cooker in self._cookers:
+                for container in self._containers:
+                    residue = (target.value() - cooker.value() - container.value()) % self._modulo
+                    for ingredients in self._reconstruct(count, residue):
+                        yield Recipe(cooker, container, ingredients)
+
+    def is_feasible(self, target: SkillAffinity) -> bool:
+        for cooker in self._cookers:
+            for container in self._containers:
+                residue = (target.value() - cooker.value() - container.value()) % self._modulo
+                if any(self._has(len(self._items), count, residue)
+                       for count in range(self._min_ingredients, self._max_ingredients + 1)):
+                    return True
+        return False
+
+    def reachable_skills(self) -> List[SkillAffinity]:
+        """
+        All skills which at least one recipe from the inventory results in.
+        """
+        return [skill for skill in self._kb.skill_affinities().values() if self.is_feasible(skill)]
+
+    def _build_layers(self) -> List[List[int]]:
+        layer = empty_layer(self._max_ingredients)
+        layers = [layer]
+
+        for _, value, held in self._items:
+            layer = extend_layer(layer, value, held, self._modulo)
+            layers.append(layer)
+
+        return layers
+
+    def _has(self, num_items: int, count: int, residue: int) -> bool:
+        return bool(self._layers[num_items][count] >> residue & 1)
+
+    def _reconstruct(self, count: int, residue: int) -> Iterator[List[RecipeIngredient]]:
+        if not self._has(len(self._items), count, residue):
+            return
+
+        # Each entry is (items left to decide, ingredients still needed, residue still needed, chosen so far), with
+        # the choices stored as a linked list of (item index, repetitions, rest).
+        stack = [(len(self._items), count, residue, None)]
+        while stack:
+            num_items, count, residue, chosen = stack.pop()
+            if num_items == 0:
+                yield self._expand(chosen)
+                continue
+
+            _, value, held = self._items[num_items - 1]
+            for j in range(min(held, count), -1, -1):
+                remaining = (residue - j * value) % self._modulo
+                if self._has(num_items - 1, count - j, remaining):
+                    stack.append((num_items - 1, count - j, remaining,
+                                  (num_items - 1, j, chosen) if j else chosen))
+
+    def _expand(self, chosen) -> List[RecipeIngredient]:
+        ingredients = []
+        while chosen is not None:
+            idx, repetitions, chosen = chosen
+            ingredients.extend(self._items[idx][0].clone() for _ in range(repetitions))
+        return ingredients
+
+
+def rotate_residues(mask: int, shift: int, modulo: int = Ingredient.MAX_INGREDIENT_ID) -> int:
+    """
+    Add `shift` to every residue in a bitmask of residues modulo `modulo`.
+    """
+    shift %= modulo
+    if shift == 0:
+        return mask
+    return ((mask << shift) | (mask >> (modulo - shift))) & ((1 << modulo) - 1)
+
+
+def empty_layer(max_ingredients: int) -> List[int]:
+    """
+    The reachable residues of an empty inventory: only zero ingredients, with a residue of zero.
+    """
+    layer = [0] * (max_ingredients + 1)
+    layer[0] = 1
+    return layer
+
+
+def extend_layer(layer: List[int], value: int, held: int, modulo: int = Ingredient.MAX_INGREDIENT_ID) -> List[int]:
+    """
+    Add an item to a table of reachable residues, where `layer[k]` is the bitmask of residues reachable with
+    exactly `k` ingredients.
+    :param value: The item's affinity value.
+    :param held: The most times the item may be used.
+    """
+    out = list(layer)
+    # Adding the item j times shifts the residues of layer[k - j] by j * value.
+    for j in range(1, held + 1):
+        for count in range(j, len(layer)):
+            if layer[count - j]:
+                out[count] |= rotate_residues(layer[count - j], j * value, modulo)
+    return out
+
+
+def extend_layer_unbounded(layer: List[int], values: Iterable[int],
+                           modulo: int = Ingredient.MAX_INGREDIENT_ID) -> List[int]:
+    """
+    Add items which may be used any number of times to a table of reachable residues. Only the distinct residues
+    of `values` matter, and the cost is linear in the number of ingredients rather than quadratic.
+    """
+    residues = {value % modulo for value in values}
+    out = list(layer)
+    # Ascending counts let out[k - 1] already include any number of uses of every item.
+    for count in range(1, len(out)):
+        previous = out[count - 1]
+        if previous:
+            for residue in residues:
+                out[count] |= rotate_residues(previous, residue, modulo)
+    return out
@@ -0,0 +1,253 @@
+"""
+    planner.py
+
+    Plans one recipe for each of several target skills while using as few distinct ingredients as possible.
+"""
+
+import random
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from wurm_food.knowledge import Container, Cooker, Ingredient, KnowledgeBase, PreparationMethod, Rarity, SkillAffinity
+from wurm_food.recipe.ingredient import RecipeIngredient
+from wurm_food.recipe.recipe import Recipe
+from wurm_food.recipe.search.inventory import InventorySolver, empty_layer, extend_layer_unbounded, rotate_residues
+
+
+class MultiTargetPlan(object):
+    """
+    A recipe for each reachable target, and the distinct base ingredients they use between them.
+    """
+    def __init__(self, recipes: Dict[SkillAffinity, Recipe], ingredients: Set[Ingredient],
+                 unreachable: List[SkillAffinity]):
+        self._recipes = recipes
+        self._ingredients = ingredients
+        self._unreachable = unreachable
+
+    def __len__(self):
+        return len(self._recipes)
+
+    def recipes(self) -> Dict[SkillAffinity, Recipe]:
+        return self._recipes
+
+    def ingredients(self) -> Set[Ingredient]:
+        return self._ingredients
+
+    def unreachable(self) -> List[SkillAffinity]:
+        """
+        Targets which no recipe from the candidate ingredients can reach.
+        """
+        return self._unreachable
+
+    def cost(self) -> int:
+        return len(self._ingredients)
+
+
+class MultiTargetPlanner(object):
+    """
+    Chooses a small set of base ingredients from which every target skill can be cooked, then builds a recipe for
+    each target from only that set. Any preparation method may be applied to a chosen ingredient, and an ingredient
+    may be used as often as needed.
+
+    Since ingredients may be reused freely, what a set of ingredients can reach only depends on the distinct
+    affinity residues their preparations give, so each candidate is reduced to a bitmask of residues up front.
+
+    The set is chosen with a greedy set cover: each step adds the ingredient which makes the most uncovered targets
+    reachable, breaking ties by how many affinities become reachable overall. Candidates are scored in order of how
+    many new residues they add, so when the time budget runs out the best scored so far is taken. Redundant
+    ingredients are then pruned. Any remaining budget is spent on randomized greedy restarts looking for smaller
+    sets, until `max_stale_restarts` of them in a row find nothing smaller.
+    :param ingredients: The candidate base ingredients. Defaults to every ingredient in the knowledge base.
+    :param preparation_methods: The preparations which may be applied. Defaults to all of them.
+    :param rarity: The rarity of every ingredient used. Defaults to normal.
+    :param seed: Seeds the randomized restarts.
+    :param max_stale_restarts: The number of restarts in a row without a smaller set after which the search stops
+    early, or None to keep searching until the time budget runs out.
+    """
+    def __init__(self, kb: KnowledgeBase, targets: Iterable[SkillAffinity], cookers: Iterable[Cooker],
+                 containers: Iterable[Container], ingredients: Optional[Iterable[Ingredient]] = None,
+                 preparation_methods: Optional[Iterable[PreparationMethod]] = None, rarity: Optional[Rarity] = None,
+                 min_ingredients: int = 1, max_ingredients: int = 10, seed: Optional[int] = None,
+                 max_stale_restarts: Optional[int] = 200):
+        self._kb = kb
+        self._modulo = Ingredient.MAX_INGREDIENT_ID
+        self._targets = list(targets)
+        self._cookers = list(cookers)
+        self._containers = list(containers)
+        self._min_ingredients = min_ingredients
+        self._max_ingredients = max_ingredients
+        self._rng = random.Random(seed)
+        self._max_stale_restarts = max_stale_restarts
+
+        self._rarity = kb.get_rarity(Rarity.NORMAL_NAME) if rarity is None else rarity
+        self._preparation_methods = list(kb.preparation_methods().values()) if preparation_methods is None \
+            else list(preparation_methods)
+        self._candidates = list(kb.ingredients().values()) if ingredients is None else list(ingredients)
+
+        self._bases = {(cooker.value() + container.value()) % self._modulo
+                       for cooker in self._cookers for container in self._containers}
+        self._target_mask = 0
+        for target in self._targets:
+            self._target_mask |= 1 << (target.value() % self._modulo)
+
+        # Filled in by _prepare, within the time budget of the first plan.
+        self._offset_methods: Dict[int, PreparationMethod] = {}
+        self._residues: Optional[Dict[Ingredient, int]] = None
+        self._goal = 0
+
+    def plan(self, time_budget: float = 1.0) -> MultiTargetPlan:
+        """
+        Return the best plan found within `time_budget` seconds. A first plan is always completed: once the budget
+        is spent, its remaining steps take the first candidate in estimated order without scoring the rest.
+        """
+        best = None
+        for plan in self.iter_plans(time_budget):
+            best = plan
+        return best
+
+    def iter_plans(self, time_budget: float = 1.0) -> Iterator[MultiTargetPlan]:
+        """
+        Yield successively smaller plans. Stops when the time budget runs out, when a plan needs at most one
+        ingredient, or after `max_stale_restarts` restarts in a row find no smaller plan.
+        """
+        deadline = time.perf_counter() + time_budget
+        self._prepare()
+        best = self._prune(self._greedy(randomize=False, deadline=deadline, complete=True))
+        yield self._build_plan(best)
+
+        stale_restarts = 0
+        while len(best) > 1 and time.perf_counter() < deadline:
+            if self._max_stale_restarts is not None and stale_restarts >= self._max_stale_restarts:
+                break
+            chosen = self._greedy(randomize=True, limit=len(best) - 1, deadline=deadline)
+            if chosen is not None:
+                chosen = self._prune(chosen)
+            if chosen is None or len(chosen) >= len(best):
+                stale_restarts += 1
+                continue
+            stale_restarts = 0
+            best = chosen
+            yield self._build_plan(best)
+
+    def _prepare(self):
+        if self._residues is not None:
+            return
+
+        offsets = 0
+        for method in self._preparation_methods:
+            offset = (self._rarity.value() + method.value()) % self._modulo
+            self._offset_methods.setdefault(offset, method)
+            offsets |= 1 << offset
+
+        self._residues = {}
+        union = 0
+        for ingredient in self._candidates:
+            residues = rotate_residues(offsets, ingredient.value(), self._modulo)
+            self._residues[ingredient] = residues
+            union |= residues
+        self._goal = self._reachable(self._closure(union)) & self._target_mask
+
+    def _closure(self, residues: int) -> List[int]:
+        return extend_layer_unbounded(empty_layer(self._max_ingredients), _bits(residues), self._modulo)
+
+    def _reachable(self, layer: List[int]) -> int:
+        """
+        The bitmask of recipe affinities reachable with any cooker and container.
+        """
+        residues = 0
+        for count in range(self._min_ingredients, self._max_ingredients + 1):
+            residues |= layer[count]
+        reachable = 0
+        for base in self._bases:
+            reachable |= rotate_residues(residues, base, self._modulo)
+        return reachable
+
+    def _greedy(self, randomize: bool, deadline: float, limit: Optional[int] = None,
+                complete: bool = False) -> Optional[List[Ingredient]]:
+        """
+        :param complete: Always finish, falling back to the estimated order after the deadline, instead of giving up.
+        """
+        chosen = []
+        union = 0
+        layer = empty_layer(self._max_ingredients)
+        covered = self._reachable(layer) & self._goal
+        remaining = list(self._candidates)
+
+        while covered != self._goal:
+            if limit is not None and len(chosen) >= limit:
+                return None
+            if not complete and time.perf_counter() >= deadline:
+                return None
+
+            # Only residues not already in the union can change what is reachable.
+            new_residues = [(bin(self._residues[ingredient] & ~union).count('1'), idx)
+                            for idx, ingredient in enumerate(remaining)]
+            new_residues = [entry for entry in new_residues if entry[0]]
+            new_residues.sort(reverse=True)
+
+            scored: List[Tuple[Tuple[int, int], int, List[int]]] = []
+            for _, idx in new_residues:
+                if scored and time.perf_counter() >= deadline:
+                    break
+                added = self._residues[remaining[idx]] & ~union
+                new_layer = extend_layer_unbounded(layer, _bits(added), self._modulo)
+                reachable = self._reachable(new_layer)
+                gain = bin(reachable & self._goal & ~covered).count('1')
+                scored.append(((gain, bin(reachable).count('1')), idx, new_layer))
+
+            scored.sort(key=lambda entry: entry[0], reverse=True)
+            if randomize:
+                _, idx, layer = self._rng.choice(scored[:3])
+            else:
+                _, idx, layer = scored[0]
+
+            ingredient = remaining.pop(idx)
+            chosen.append(ingredient)
+            union |= self._residues[ingredient]
+            covered = self._reachable(layer) & self._goal
+
+        return chosen
+
+    def _prune(self, chosen: List[Ingredient]) -> List[Ingredient]:
+        chosen = list(chosen)
+        for ingredient in sorted(chosen, key=lambda _: self._rng.random()):
+            without = [other for other in chosen if other != ingredient]
+            union = 0
+            for other in without:
+                union |= self._residues[other]
+            if self._reachable(self._closure(union)) & self._goal == self._goal:
+                chosen = without
+        return chosen
+
+    def _build_plan(self, chosen: List[Ingredient]) -> MultiTargetPlan:
+        # One preparation per distinct residue is enough, since each may be used as often as needed.
+        inventory = {}
+        seen = 0
+        for ingredient in chosen:
+            for offset, method in self._offset_methods.items():
+                residue = (ingredient.value() + offset) % self._modulo
+                if not seen >> residue & 1:
+                    seen |= 1 << residue
+                    inventory[RecipeIngredient(ingredient, self._rarity, method)] = self._max_ingredients
+        solver = InventorySolver(self._kb, inventory, self._cookers, self._containers,
+                                 min_ingredients=self._min_ingredients, max_ingredients=self._max_ingredients)
+
+        recipes = {}
+        unreachable = []
+        for target in self._targets:
+            if not self._goal >> (target.value() % self._modulo) & 1:
+                unreachable.append(target)
+                continue
+            recipes[target] = solver.solve(target, limit=1)[0]
+
+        used = {ingredient.ingredient() for recipe in recipes.values() for ingredient in recipe}
+        return MultiTargetPlan(recipes, used, unreachable)
+
+
+def _bits(mask: int) -> List[int]:
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
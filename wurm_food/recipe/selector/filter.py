@@ -1,10 +1,11 @@
 from abc import ABC
 import random
-from typing import List, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-from wurm_food.knowledge import KnowledgeBase, PreparationMethod
+from wurm_food.knowledge import Ingredient, KnowledgeBase, PreparationMethod, Rarity
 from wurm_food.recipe.ingredient import RecipeIngredient
 from wurm_food.recipe.selector.selector import Selector
+from wurm_food.util import AliasTable
 
 
 class Filter(Selector, ABC):
@@ -36,6 +37,106 @@ class UniformSampleFilter(Filter):
         return out_ingredients
 
 
+class WeightedSampleFilter(Filter):
+    """
+    Sample from the child ingredients with a bias. Each ingredient's weight is the product of every weight that
+    applies to it, and ingredients with a weight of zero are never selected. The alias table for a pool of child
+    ingredients is built once and reused while the child keeps returning the same pool from the same version of the
+    knowledge base, making each draw O(1).
+    :param num_samples: The number of ingredients to select.
+    :param allow_duplicates: Whether the same child ingredient may be selected more than once.
+    :param weights: A callable returning the weight of a child ingredient.
+    :param ingredient_weights: Weights by base ingredient name.
+    :param category_weights: Weights by category name. An ingredient in several categories uses the largest.
+    :param rarity_weights: Weights by rarity name.
+    :param default_weight: The weight used where a mapping has no entry for an ingredient.
+    """
+    def __init__(self, child: Selector, num_samples: int = 1, allow_duplicates: bool = False,
+                 weights: Optional[Callable[[RecipeIngredient], float]] = None,
+                 ingredient_weights: Optional[Dict[str, float]] = None,
+                 category_weights: Optional[Dict[str, float]] = None,
+                 rarity_weights: Optional[Dict[str, float]] = None,
+                 default_weight: float = 1.0):
+        super().__init__(child)
+        self._num_samples = num_samples
+        self._allow_duplicates = allow_duplicates
+        self._weights = weights
+        self._ingredient_weights = ingredient_weights
+        self._category_weights = category_weights
+        self._rarity_weights = rarity_weights
+        self._default_weight = default_weight
+        self._cached_pool: Optional[Tuple[KnowledgeBase, int, Tuple, List[float], AliasTable]] = None
+
+    def select(self, kb: KnowledgeBase) -> List[RecipeIngredient]:
+        child_ingredients = self.get_child_ingredients(kb)
+        weights, table = self._alias_table(kb, child_ingredients)
+
+        if self._allow_duplicates:
+            return [child_ingredients[table.sample()] for _ in range(self._num_samples)]
+
+        return [child_ingredients[idx] for idx in self._sample_without_replacement(weights, table)]
+
+    def weight(self, ingredient: Union[RecipeIngredient, Ingredient]) -> float:
+        if isinstance(ingredient, RecipeIngredient):
+            base = ingredient.ingredient()
+            rarity = ingredient.rarity().name()
+        else:
+            base = ingredient
+            rarity = Rarity.NORMAL_NAME
+
+        weight = 1.0
+        if self._weights is not None:
+            weight *= self._weights(ingredient)
+        if self._ingredient_weights is not None:
+            weight *= self._ingredient_weights.get(base.name(), self._default_weight)
+        if self._category_weights is not None:
+            weight *= max((self._category_weights[category] for category in base.categories()
+                           if category in self._category_weights), default=self._default_weight)
+        if self._rarity_weights is not None:
+            weight *= self._rarity_weights.get(rarity, self._default_weight)
+        return weight
+
+    def _alias_table(self, kb: KnowledgeBase,
+                     child_ingredients: List[RecipeIngredient]) -> Tuple[List[float], AliasTable]:
+        # The cache is replaced as a single tuple so a filter shared between threads never mixes up pools.
+        # Ingredients compare equal by name alone, so a reload which changes their ids or categories would still
+        # match the old pool; the knowledge base version catches that.
+        pool = tuple(child_ingredients)
+        version = kb.version()
+        cached = self._cached_pool
+        if cached is None or cached[0] is not kb or cached[1] != version or cached[2] != pool:
+            weights = [self.weight(ingredient) for ingredient in child_ingredients]
+            cached = (kb, version, pool, weights, AliasTable(weights))
+            self._cached_pool = cached
+        return cached[3], cached[4]
+
+    def _sample_without_replacement(self, weights: List[float], table: AliasTable) -> List[int]:
+        available = sum(1 for weight in weights if weight > 0)
+        if self._num_samples > available:
+            raise ValueError('Cannot select {} ingredients without duplicates from {} with a non-zero weight'
+                             .format(self._num_samples, available))
+
+        chosen = []
+        seen = set()
+        indices = list(range(len(weights)))
+        misses = 0
+        while len(chosen) < self._num_samples:
+            idx = indices[table.sample()]
+            if idx not in seen:
+                seen.add(idx)
+                chosen.append(idx)
+                continue
+
+            # Once most of the weight has been drawn, rejection becomes slow. Rebuild over what remains instead.
+            misses += 1
+            if misses > len(indices):
+                indices = [idx for idx, weight in enumerate(weights) if weight > 0 and idx not in seen]
+                table = AliasTable([weights[idx] for idx in indices])
+                misses = 0
+
+        return chosen
+
+
 class DedupFilter(Filter):
     def __init__(self, child: Selector):
         super().__init__(child)
@@ -1,9 +1,10 @@
 from abc import ABC, abstractmethod
 from typing import Any, List, NamedTuple, Union, Dict, Optional
 
-from wurm_food.knowledge import KnowledgeBase
+from wurm_food.knowledge import KnowledgeBase, PreparationMethod
 from wurm_food.recipe.ingredient import RecipeIngredient
-from wurm_food.recipe.selector.filter import UniformSampleFilter, PrepareIngredientFilter, DedupFilter
+from wurm_food.recipe.selector.filter import UniformSampleFilter, PrepareIngredientFilter, DedupFilter, \
+    WeightedSampleFilter
 from wurm_food.recipe.selector.selector import IngredientCategorySelector, ExactIngredientSelector, CombineSelector, \
     Selector
 
@@ -48,8 +49,8 @@ class SelectorRegistryArgDescriptor(object):
             elif not self._allow_missing:
                 raise KeyError('Argument #{} is not specified and is required'.format(idx))
 
-        for name, arg in kwargs:
-            if name in self._positional_args:
+        for name, arg in kwargs.items():
+            if name in self._named_args:
                 out_kw_args[name] = self._named_args[name].parse_arg(arg, kb)
             elif not self._allow_missing:
                 raise KeyError('Argument \'{}\' is not specified and is required'.format(name))
@@ -100,6 +101,15 @@ class RecipeIngredientArg(RegistryArg):
         return RecipeIngredient.from_name_string(name, kb)
 
 
+class PreparationMethodArg(RegistryArg):
+    def parse_arg(self, arg: Union[str, List[str]], kb: KnowledgeBase) -> Union[PreparationMethod, List[PreparationMethod]]:
+        if isinstance(arg, list):
+            return [self.parse_arg(name, kb) for name in arg]
+        if isinstance(arg, PreparationMethod):
+            return arg
+        return kb.get_preparation_method(arg)
+
+
 class LiteralArg(RegistryArg):
     def parse_arg(self, arg: Any, kb: KnowledgeBase) -> Any:
         return arg
@@ -114,5 +124,9 @@ SELECTOR_REGISTRY.register_selector('combine', CombineSelector)
 
 FILTER_REGISTRY: FilterRegistry = FilterRegistry()
 FILTER_REGISTRY.register_filter('uniform_sample', UniformSampleFilter)
-FILTER_REGISTRY.register_filter('prepare', PrepareIngredientFilter)
+FILTER_REGISTRY.register_filter('weighted_sample', WeightedSampleFilter)
+FILTER_REGISTRY.register_filter('prepare', PrepareIngredientFilter, {
+    0: PreparationMethodArg(),
+    'preparation_methods': PreparationMethodArg(),
+})
 FILTER_REGISTRY.register_filter('dedup', DedupFilter)
\ No newline at end of file
@@ -39,12 +39,7 @@ class IngredientCategorySelector(Selector):
         self._category = category
 
     def select(self, kb: KnowledgeBase) -> List[RecipeIngredient]:
-        selected = []
-        for ingredient in kb.ingredients().values():
-            if self._category in ingredient.categories():
-                selected.append(ingredient)
-
-        return selected
+        return list(kb.ingredients_in_category(self._category))
 
 
 class CombineSelector(Selector):
@@ -0,0 +1,310 @@
+"""
+    shared.py
+
+    Shares a single loaded KnowledgeBase between processes through a shared memory segment. The parent process
+    builds the knowledge base once and publishes it; workers attach by segment name instead of re-reading the
+    json files.
+
+    The ingredients, which are the bulk of the data, are stored in the segment as flat arrays: ids, group ids,
+    combine ids, affinity values, keys and names, and category membership in both directions. Workers read them through
+    memoryviews onto the segment, so adding workers does not add copies of them. Ingredient objects are only
+    created as they are looked up. The remaining collections are small, and are rebuilt in each worker.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from multiprocessing import resource_tracker, shared_memory
+import pickle
+import struct
+from typing import Dict, Iterator, List, Optional
+
+from wurm_food.knowledge import Ingredient, KnowledgeBase
+
+_HEADER = struct.Struct('<Q')
+_ALIGNMENT = 8
+
+_SMALL_COLLECTIONS = ('containers', 'cookers', 'categories', 'preparation_methods', 'rarities', 'skill_affinities')
+
+_worker_knowledge_base: Optional[KnowledgeBase] = None
+
+
+class SharedKnowledgeBase(object):
+    """
+    Owns a shared memory segment holding a KnowledgeBase. The segment lives until `unlink` is called, or the `with`
+    block exits. Workers which are already attached keep their mapping after it is unlinked.
+    :param kb: The knowledge base to publish. Any lazily loaded collections are loaded first.
+    """
+    def __init__(self, kb: KnowledgeBase):
+        sections = _build_sections(kb)
+        category_names = sections.pop('_category_names')
+
+        layout = {}
+        offset = 0
+        for name, (typecode, data) in sections.items():
+            layout[name] = (typecode, offset, len(data))
+            offset += len(data) + (-len(data) % _ALIGNMENT)
+
+        meta = pickle.dumps({
+            'collections': {name: getattr(kb, name)() for name in _SMALL_COLLECTIONS},
+            'category_names': category_names,
+            'content_hash': kb.content_hash(),
+            'version': kb.version(),
+            'layout': layout,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        data_start = _HEADER.size + len(meta) + (-(_HEADER.size + len(meta)) % _ALIGNMENT)
+
+        self._size = data_start + offset
+        self._shm = shared_memory.SharedMemory(create=True, size=max(self._size, 1))
+        _HEADER.pack_into(self._shm.buf, 0, len(meta))
+        self._shm.buf[_HEADER.size:_HEADER.size + len(meta)] = meta
+        for name, (_, data) in sections.items():
+            _, start, length = layout[name]
+            self._shm.buf[data_start + start:data_start + start + length] = data
+
+    def __enter__(self) -> 'SharedKnowledgeBase':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        self.unlink()
+
+    def name(self) -> str:
+        return self._shm.name
+
+    def size(self) -> int:
+        return self._size
+
+    def close(self):
+        self._shm.close()
+
+    def unlink(self):
+        # An attach in a process sharing this one's resource tracker may have unregistered the segment, see
+        # _SharedTables. Registering is idempotent, and unlink unregisters it again.
+        resource_tracker.register(self._shm._name, 'shared_memory')
+        self._shm.unlink()
+
+    @staticmethod
+    def attach(name: str) -> 'AttachedKnowledgeBase':
+        """
+        Attach to the knowledge base published under `name`. The segment stays mapped for as long as the returned
+        knowledge base, or any ingredient mapping taken from it, is alive.
+        """
+        return AttachedKnowledgeBase(_SharedTables(name))
+
+
+class _SharedTables(object):
+    """
+    Holds the mapping of a segment and the memoryviews onto it, releasing them together once nothing refers to
+    them any longer.
+    """
+    def __init__(self, name: str):
+        self._shm = None
+        self._views = []
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # `track` is only available from python 3.13. Before that, attaching registers the segment with this
+            # process's resource tracker, which would unlink it when this process exits.
+            self._shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+
+        meta_size, = _HEADER.unpack_from(self._shm.buf, 0)
+        meta_view = self._shm.buf[_HEADER.size:_HEADER.size + meta_size]
+        try:
+            self.meta = pickle.loads(meta_view)
+        finally:
+            meta_view.release()
+
+        data_start = _HEADER.size + meta_size + (-(_HEADER.size + meta_size) % _ALIGNMENT)
+        for section, (typecode, start, length) in self.meta['layout'].items():
+            view = self._shm.buf[data_start + start:data_start + start + length]
+            self._views.append(view)
+            if typecode != 'B':
+                view = view.cast(typecode)
+                self._views.append(view)
+            setattr(self, section, view)
+
+    def __del__(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self._shm is not None:
+            self._shm.close()
+
+
+class SharedIngredients(Mapping):
+    """
+    A read-only mapping of ingredient name to Ingredient, backed by the arrays in a shared segment. Iteration
+    follows the original order, and lookups binary search a key-sorted index. Each Ingredient is created on its
+    first lookup and then kept, so a worker's private memory only grows with the ingredients it actually uses.
+    """
+    def __init__(self, tables: _SharedTables):
+        self._tables = tables
+        self._category_names: List[str] = tables.meta['category_names']
+        self._indices: Dict[str, int] = {}
+        self._materialized: Dict[int, Ingredient] = {}
+
+    def __len__(self):
+        return len(self._tables.ids)
+
+    def __iter__(self) -> Iterator[str]:
+        for idx in range(len(self)):
+            yield self.key(idx)
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and self.index(name) is not None
+
+    def __getitem__(self, name: str) -> Ingredient:
+        idx = self.index(name) if isinstance(name, str) else None
+        if idx is None:
+            raise KeyError(name)
+        return self.ingredient(idx)
+
+    def key(self, idx: int) -> str:
+        return self._key_bytes(idx).decode('utf-8')
+
+    def index(self, name: str) -> Optional[int]:
+        """
+        The position of the key `name` in iteration order, or None if there is no such ingredient.
+        """
+        idx = self._indices.get(name)
+        if idx is not None:
+            return idx
+
+        key = name.encode('utf-8')
+        by_key = self._tables.by_key
+        pos = bisect_left(range(len(by_key)), key, key=lambda pos: self._key_bytes(by_key[pos]))
+        if pos < len(by_key) and self._key_bytes(by_key[pos]) == key:
+            self._indices[name] = by_key[pos]
+            return by_key[pos]
+        return None
+
+    def ingredient(self, idx: int) -> Ingredient:
+        ingredient = self._materialized.get(idx)
+        if ingredient is None:
+            ingredient = self._materialize(idx)
+            self._materialized[idx] = ingredient
+        return ingredient
+
+    def _materialize(self, idx: int) -> Ingredient:
+        tables = self._tables
+        offsets = tables.ingredient_category_offsets
+        categories = [self._category_names[category]
+                      for category in tables.ingredient_categories[offsets[idx]:offsets[idx + 1]]]
+        name = bytes(tables.names[tables.name_offsets[idx]:tables.name_offsets[idx + 1]]).decode('utf-8')
+        return Ingredient(name, tables.ids[idx], tables.group_ids[idx], tables.combine_ids[idx], categories)
+
+    def _key_bytes(self, idx: int) -> bytes:
+        offsets = self._tables.key_offsets
+        return bytes(self._tables.keys[offsets[idx]:offsets[idx + 1]])
+
+
+class AttachedKnowledgeBase(KnowledgeBase):
+    """
+    A knowledge base whose ingredients and derived lookup tables live in a shared memory segment. It is read-only:
+    `reload` has no sources and never changes anything.
+    """
+    def __init__(self, tables: _SharedTables):
+        super().__init__()
+        self._tables = tables
+        for name, collection in tables.meta['collections'].items():
+            setattr(self, '_' + name, collection)
+        self._ingredients = SharedIngredients(tables)
+        self._category_ids: Dict[str, int] = {name: idx for idx, name in enumerate(tables.meta['category_names'])}
+        self._shared_category_index: Dict[str, List[Ingredient]] = {}
+        self._shared_content_hash = tables.meta['content_hash']
+        self._version = tables.meta['version']
+
+    def __getstate__(self):
+        raise TypeError('An AttachedKnowledgeBase cannot be pickled; attach to the segment by name instead')
+
+    def content_hash(self) -> str:
+        return self._shared_content_hash
+
+    def ingredients_in_category(self, category: str) -> List[Ingredient]:
+        selected = self._shared_category_index.get(category)
+        if selected is None:
+            idx = self._category_ids.get(category)
+            offsets = self._tables.category_offsets
+            selected = [] if idx is None else [
+                self._ingredients.ingredient(member)
+                for member in self._tables.category_members[offsets[idx]:offsets[idx + 1]]
+            ]
+            self._shared_category_index[category] = selected
+        return selected
+
+    def ingredient_values(self) -> memoryview:
+        """
+        The affinity value of each ingredient, modulo `Ingredient.MAX_INGREDIENT_ID`, in iteration order.
+        """
+        return self._tables.values
+
+
+def _build_sections(kb: KnowledgeBase) -> Dict:
+    keys = list(kb.ingredients().keys())
+    ingredients = list(kb.ingredients().values())
+    # The data has a numeric category on one ingredient, so order categories by their text rather than directly.
+    category_names = sorted({category for ingredient in ingredients for category in ingredient.categories()},
+                            key=lambda category: (type(category).__name__, str(category)))
+    category_ids = {name: idx for idx, name in enumerate(category_names)}
+
+    # Keys and names differ for a few ingredients in the data, so both are kept.
+    encoded_keys = [key.encode('utf-8') for key in keys]
+    encoded_names = [ingredient.name().encode('utf-8') for ingredient in ingredients]
+
+    ingredient_category_offsets = array('q', [0])
+    ingredient_categories = array('q')
+    members = [array('q') for _ in category_names]
+    for idx, ingredient in enumerate(ingredients):
+        for category in ingredient.categories():
+            ingredient_categories.append(category_ids[category])
+            members[category_ids[category]].append(idx)
+        ingredient_category_offsets.append(len(ingredient_categories))
+
+    category_offsets = array('q', [0])
+    category_members = array('q')
+    for member_list in members:
+        category_members.extend(member_list)
+        category_offsets.append(len(category_members))
+
+    arrays = {
+        'ids': array('q', [ingredient.id() for ingredient in ingredients]),
+        'group_ids': array('q', [ingredient.group_id() for ingredient in ingredients]),
+        'combine_ids': array('q', [ingredient.combine_id() for ingredient in ingredients]),
+        'values': array('q', [ingredient.value() % Ingredient.MAX_INGREDIENT_ID for ingredient in ingredients]),
+        'by_key': array('q', sorted(range(len(ingredients)), key=lambda idx: encoded_keys[idx])),
+        'key_offsets': _offsets(encoded_keys),
+        'name_offsets': _offsets(encoded_names),
+        'ingredient_category_offsets': ingredient_category_offsets,
+        'ingredient_categories': ingredient_categories,
+        'category_offsets': category_offsets,
+        'category_members': category_members,
+    }
+    sections = {name: (values.typecode, values.tobytes()) for name, values in arrays.items()}
+    sections['keys'] = ('B', b''.join(encoded_keys))
+    sections['names'] = ('B', b''.join(encoded_names))
+    sections['_category_names'] = category_names
+    return sections
+
+
+def _offsets(encoded: List[bytes]) -> array:
+    offsets = array('q', [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return offsets
+
+
+def initialize_worker(name: str):
+    """
+    A process pool initializer which attaches to a SharedKnowledgeBase. Use together with
+    `worker_knowledge_base`, eg `Pool(initializer=initialize_worker, initargs=(shared.name(),))`.
+    """
+    global _worker_knowledge_base
+    _worker_knowledge_base = SharedKnowledgeBase.attach(name)
+
+
+def worker_knowledge_base() -> KnowledgeBase:
+    if _worker_knowledge_base is None:
+        raise RuntimeError('initialize_worker has not been called in this process')
+    return _worker_knowledge_base
@@ -0,0 +1,105 @@
+"""
+    synthetic.py
+
+    Generates synthetic knowledge base directories, in the same json schema as data/knowledge, for testing how the
+    library scales with the size of the reference data.
+"""
+
+import argparse
+import json
+import os
+import random
+from typing import Dict, List, Optional
+
+from wurm_food.knowledge import KnowledgeBase, PreparationMethod
+
+
+def generate_knowledge(out_dir: str, base: KnowledgeBase, ingredient_scale: float = 10.0,
+                       category_scale: Optional[float] = None, preparation_scale: Optional[float] = None,
+                       seed: Optional[int] = None) -> Dict[str, int]:
+    """
+    Write a synthetic knowledge base to `out_dir`. Ingredients, categories and preparation methods are generated
+    at a multiple of their count in `base`. Containers, cookers, rarities and skills are copied from `base`
+    unchanged, since they are fixed by the game.
+
+    Generated names are single words, such as `ingredient000042`, so they never clash when parsed with
+    `RecipeIngredient.from_name_string`. The `whole` preparation is always kept.
+    :param base: The knowledge base to take sizes and the fixed collections from.
+    :param ingredient_scale: The multiple of the base ingredient count to generate.
+    :param category_scale: The multiple of the base category count. Defaults to `ingredient_scale`.
+    :param preparation_scale: The multiple of the base preparation count. Defaults to `ingredient_scale`.
+    :return: The number of records written for each collection.
+    """
+    rng = random.Random(seed)
+    category_scale = ingredient_scale if category_scale is None else category_scale
+    preparation_scale = ingredient_scale if preparation_scale is None else preparation_scale
+
+    num_ingredients = max(1, int(len(base.ingredients()) * ingredient_scale))
+    num_categories = max(1, int(len(base.categories()) * category_scale))
+    num_preparations = max(1, int(len(base.preparation_methods()) * preparation_scale))
+
+    categories = {}
+    for idx in range(num_categories):
+        name = 'category{:06d}'.format(idx)
+        categories[name] = {'name': name, 'id': idx + 1}
+    category_names = list(categories.keys())
+
+    ingredients = {}
+    for idx in range(num_ingredients):
+        name = 'ingredient{:06d}'.format(idx)
+        ingredients[name] = {
+            'name': name,
+            'group_id': rng.randrange(1, 100),
+            'id': rng.randrange(1, 20 * num_ingredients),
+            'comb_id': idx,
+            'category': rng.sample(category_names, 1 if rng.random() < 0.9 or num_categories < 2 else 2),
+        }
+
+    preparations = {PreparationMethod.NULL_NAME: {'name': PreparationMethod.NULL_NAME, 'value': 0}}
+    for idx in range(num_preparations - 1):
+        name = 'prepared{:06d}'.format(idx)
+        preparations[name] = {'name': name, 'value': rng.randrange(1, 64)}
+
+    collections = {
+        'container.json': ('containers', _name_values(base.containers())),
+        'cooker.json': ('cookers', _name_values(base.cookers())),
+        'category.json': ('categories', categories),
+        'ingredient.json': ('ingredients', ingredients),
+        'preparation.json': ('preparations', preparations),
+        'rarity.json': ('rarities', _name_values(base.rarities())),
+        'skill.json': ('skills', _name_values(base.skill_affinities())),
+        'recipes.json': ('recipes', {}),
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {}
+    for filename, (key, records) in collections.items():
+        with open(os.path.join(out_dir, filename), 'w') as fp:
+            json.dump({key: records}, fp, indent=2)
+        counts[key] = len(records)
+
+    return counts
+
+
+def _name_values(collection: Dict) -> Dict[str, Dict]:
+    return {key: {'name': value.name(), 'value': value.value()} for key, value in collection.items()}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Write a synthetic knowledge base directory.')
+    parser.add_argument('out_dir', help='The directory to write to')
+    parser.add_argument('-k', '--knowledge', default='data/knowledge', help='The base knowledge directory')
+    parser.add_argument('-s', '--scale', type=float, default=10.0, help='The ingredient scale')
+    parser.add_argument('--category-scale', type=float, help='The category scale. Defaults to --scale')
+    parser.add_argument('--preparation-scale', type=float, help='The preparation scale. Defaults to --scale')
+    parser.add_argument('--seed', type=int, help='The random seed')
+    args = parser.parse_args(argv)
+
+    counts = generate_knowledge(args.out_dir, KnowledgeBase.load_from_json(args.knowledge), args.scale,
+                                args.category_scale, args.preparation_scale, args.seed)
+    for key, count in counts.items():
+        print('{}: {}'.format(key, count))
+
+
+if __name__ == '__main__':
+    main()
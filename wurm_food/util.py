@@ -1,6 +1,7 @@
 from __future__ import annotations
 from functools import total_ordering, singledispatchmethod
-from typing import TypeVar, Union, Callable
+import random
+from typing import TypeVar, Union, Callable, Sequence
 
 from wurm_food.knowledge import Ingredient
 
@@ -9,7 +10,7 @@ from wurm_food.knowledge import Ingredient
 class AffinityValue(object):
     def __init__(self, value, modulo=Ingredient.MAX_INGREDIENT_ID):
         self._modulo = modulo
-        if type(value) == 'int':
+        if isinstance(value, int):
             self._value = abs(value % self._modulo)
         elif type(value) == AffinityValue:
             self._value = value.value()
@@ -71,4 +72,45 @@ class AffinityValue(object):
         elif isinstance(value, int):
             return AffinityValue(fn(self.value(), value))
         else:
-            raise TypeError("Operation only accepts objects of type AffinityValue or int")
\ No newline at end of file
+            raise TypeError("Operation only accepts objects of type AffinityValue or int")
+
+class AliasTable(object):
+    """
+    A table for drawing indices from a discrete distribution in constant time, using Vose's alias method. Building
+    the table is O(n) in the number of weights.
+    :param weights: Non-negative relative weights, one per index. At least one must be positive.
+    """
+    def __init__(self, weights: Sequence[float]):
+        count = len(weights)
+        total = float(sum(weights))
+        if count == 0 or total <= 0.0:
+            raise ValueError("AliasTable requires at least one positive weight")
+        if any(weight < 0 for weight in weights):
+            raise ValueError("AliasTable weights must not be negative")
+
+        self._prob = [1.0] * count
+        self._alias = list(range(count))
+
+        scaled = [weight * count / total for weight in weights]
+        small = [idx for idx, weight in enumerate(scaled) if weight < 1.0]
+        large = [idx for idx, weight in enumerate(scaled) if weight >= 1.0]
+
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self._prob[less] = scaled[less]
+            self._alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+
+    def __len__(self):
+        return len(self._prob)
+
+    def sample(self, rng: random.Random = random) -> int:
+        idx = int(rng.random() * len(self._prob))
+        if rng.random() < self._prob[idx]:
+            return idx
+        return self._alias[idx]